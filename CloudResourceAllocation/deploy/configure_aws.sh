@@ -0,0 +1,74 @@
+#!/bin/bash
+# Configure AWS resources used by the Lambda functions
+# Usage: ./configure_aws.sh
+
+set -e
+
+REGION="${AWS_REGION:-us-east-1}"
+TABLE_NAME="${DYNAMODB_TABLE:-ResourceAllocations}"
+INDEX_NAME="${STEP_STATUS_INDEX:-step-status-index}"
+QUEUE_NAME="${SQS_QUEUE_NAME:-SubmissionsQueue}"
+FUNCTION_NAME="${LAMBDA_FUNCTION_1:-submission-handler}"
+BATCH_SIZE="${SQS_BATCH_SIZE:-10}"
+BATCH_WINDOW="${SQS_BATCH_WINDOW:-30}"
+
+echo "=== Configuring AWS Resources ==="
+echo "Region: $REGION"
+echo "Table: $TABLE_NAME"
+
+# GSI used by get_and_send to fetch all pending allocations of a step
+# with a single query (partition key: step, sort key: timestamp)
+echo "Creating GSI $INDEX_NAME..."
+if aws dynamodb describe-table --table-name "$TABLE_NAME" --region "$REGION" \
+        --query "Table.GlobalSecondaryIndexes[?IndexName=='$INDEX_NAME'].IndexName" \
+        --output text | grep -q "$INDEX_NAME"; then
+    echo "GSI $INDEX_NAME already exists"
+else
+    aws dynamodb update-table \
+        --table-name "$TABLE_NAME" \
+        --region "$REGION" \
+        --attribute-definitions \
+            AttributeName=step,AttributeType=N \
+            AttributeName=timestamp,AttributeType=S \
+        --global-secondary-index-updates \
+            "[{\"Create\": {\"IndexName\": \"$INDEX_NAME\",
+                \"KeySchema\": [{\"AttributeName\": \"step\", \"KeyType\": \"HASH\"},
+                                {\"AttributeName\": \"timestamp\", \"KeyType\": \"RANGE\"}],
+                \"Projection\": {\"ProjectionType\": \"ALL\"}}}]" > /dev/null
+    echo "✓ Created GSI $INDEX_NAME (backfill may take a few minutes)"
+fi
+
+# SQS -> submission_handler trigger: wait up to BATCH_WINDOW seconds to
+# collect up to BATCH_SIZE messages per invocation instead of invoking
+# the function once per message
+echo "Configuring SQS event source mapping for $FUNCTION_NAME..."
+QUEUE_URL=$(aws sqs get-queue-url --queue-name "$QUEUE_NAME" --region "$REGION" \
+        --query QueueUrl --output text)
+QUEUE_ARN=$(aws sqs get-queue-attributes --queue-url "$QUEUE_URL" --region "$REGION" \
+        --attribute-names QueueArn --query Attributes.QueueArn --output text)
+MAPPING_UUID=$(aws lambda list-event-source-mappings \
+        --function-name "$FUNCTION_NAME" \
+        --event-source-arn "$QUEUE_ARN" \
+        --region "$REGION" \
+        --query "EventSourceMappings[0].UUID" --output text)
+
+if [ -n "$MAPPING_UUID" ] && [ "$MAPPING_UUID" != "None" ]; then
+    aws lambda update-event-source-mapping \
+        --uuid "$MAPPING_UUID" \
+        --region "$REGION" \
+        --batch-size "$BATCH_SIZE" \
+        --maximum-batching-window-in-seconds "$BATCH_WINDOW" > /dev/null
+    echo "✓ Updated event source mapping $MAPPING_UUID"
+else
+    aws lambda create-event-source-mapping \
+        --function-name "$FUNCTION_NAME" \
+        --event-source-arn "$QUEUE_ARN" \
+        --region "$REGION" \
+        --batch-size "$BATCH_SIZE" \
+        --maximum-batching-window-in-seconds "$BATCH_WINDOW" > /dev/null
+    echo "✓ Created event source mapping $QUEUE_NAME -> $FUNCTION_NAME"
+fi
+echo "  Batch size: $BATCH_SIZE, batching window: ${BATCH_WINDOW}s"
+
+echo ""
+echo "=== Configuration Complete ==="
@@ -50,9 +50,12 @@ cd "$APP_DIR"
 echo "Installing Python dependencies..."
 cat > requirements.txt << EOF
 Flask==3.0.0
+gunicorn==21.2.0
 boto3==1.34.0
 requests==2.31.0
 numpy==1.24.0
+numba==0.58.1
+orjson==3.9.10
 EOF
 
 pip3 install -r requirements.txt
@@ -71,11 +74,12 @@ if [ "$ROLE" = "user" ]; then
     echo "  export USER_ID=$USER_ID"
     echo "  export PORT=5000"
     echo "  cd $APP_DIR"
-    echo "  nohup python3 user/user_app.py > user.log 2>&1 &"
+    echo "  python3 user/_kernel_build.py  # optional: precompile the optimizer kernel"
+    echo "  nohup gunicorn -w 1 -k gthread --threads 8 --timeout 30 -b 0.0.0.0:\$PORT user.user_app:app > user.log 2>&1 &"
 elif [ "$ROLE" = "provider" ]; then
     echo "  export PORT=5001"
     echo "  cd $APP_DIR"
-    echo "  nohup python3 provider/provider_app.py > provider.log 2>&1 &"
+    echo "  nohup gunicorn -w 1 -k gthread --threads 8 --timeout 30 -b 0.0.0.0:\$PORT provider.provider_app:app > provider.log 2>&1 &"
 fi
 echo ""
 
@@ -4,24 +4,58 @@ Retrieves allocations from DynamoDB and sends to Resource Manager
 """
 
 import json
+import logging
 import boto3
 import os
-import urllib.request
-import urllib.error
-from datetime import datetime
-from decimal import Decimal
+import urllib3
+from botocore.config import Config
 
 # Environment variables
 DYNAMODB_TABLE = os.environ.get('DYNAMODB_TABLE', 'ResourceAllocations')
 RESOURCE_MANAGER_URL = os.environ.get('RESOURCE_MANAGER_URL', '')
 REGION = os.environ.get('AWS_REGION', 'us-east-1')
+STEP_STATUS_INDEX = os.environ.get('STEP_STATUS_INDEX', 'step-status-index')
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb', region_name=REGION)
-table = dynamodb.Table(DYNAMODB_TABLE)
+# INFO by default; set LOG_LEVEL=DEBUG to log events and payloads
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
 USER_IDS = ['S1', 'S2', 'S3']
 
+# Per-step submission counter row maintained by submission_handler
+COUNTER_USER_ID = '__counter__'
+
+# Bounded retries/timeouts keep worst-case latency within the Lambda timeout
+BOTO_CONFIG = Config(
+    max_pool_connections=max(10, 2 * len(USER_IDS)),
+    retries={'max_attempts': 2, 'mode': 'standard'},
+    connect_timeout=2,
+    read_timeout=5
+)
+
+# Initialize AWS clients (low-level client skips the resource marshalling layer)
+dynamodb_client = boto3.client('dynamodb', region_name=REGION, config=BOTO_CONFIG)
+
+# Connection pool persists across warm invocations, reusing the socket
+# to the Resource Manager instead of reconnecting on every call
+_http = urllib3.PoolManager(num_pools=1, maxsize=4,
+                            retries=urllib3.Retry(total=2, backoff_factor=0.1))
+
+# Precompiled expression for taking one processed submission off the
+# step counter (see submission_handler.record_submission)
+RESET_SUBMISSION_UPDATE_EXPR = 'DELETE submitted_users :users REMOVE #user_ts'
+RESET_SUBMISSION_CONDITION_EXPR = '#user_ts = :ts'
+
+# Precompiled query expressions for the step-status-index GSI
+PENDING_KEY_EXPR = '#st = :step'
+PENDING_FILTER_EXPR = '#s = :status'
+PENDING_PROJECTION = 'user_id, #ts, allocation_vector'
+PENDING_EXPR_NAMES = {'#st': 'step', '#s': 'status', '#ts': 'timestamp'}
+
+# Projection for reading the submitted items directly from the table
+SUBMITTED_PROJECTION = 'user_id, #ts, allocation_vector, #s'
+SUBMITTED_EXPR_NAMES = {'#s': 'status', '#ts': 'timestamp'}
+
 
 def lambda_handler(event, context):
     """
@@ -30,101 +64,186 @@ def lambda_handler(event, context):
     Event structure:
     {
         "step": 1,
-        "trigger_source": "submission_handler" or "manual"
+        "trigger_source": "submission_handler" or "manual",
+        "timestamps": {"S1": "...", ...}  // set by submission_handler
     }
     """
-    print(f"Received event: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Received event: %s", json.dumps(event))
     
     step = event.get('step', 1)
     
     try:
         # Retrieve allocations from DynamoDB
-        allocations, timestamps = get_pending_allocations(step)
+        allocations, timestamps = get_pending_allocations(step, event.get('timestamps'))
         
         if len(allocations) != len(USER_IDS):
             return {
                 'statusCode': 400,
-                'body': json.dumps({
+                'result': {
                     'error': f'Expected {len(USER_IDS)} allocations, got {len(allocations)}',
                     'allocations': allocations
-                })
+                }
             }
         
-        print(f"Retrieved allocations for step {step}: {list(allocations.keys())}")
+        logger.info("Retrieved allocations for step %s: %s", step, list(allocations.keys()))
         
         # Send to Resource Manager
         if RESOURCE_MANAGER_URL:
             response = send_to_resource_manager(allocations, step)
             
-            # Update status in DynamoDB
+            # Update status in DynamoDB and start a new submission round
             update_allocation_status(allocations, timestamps, 'processed')
+            reset_submission_counter(step, timestamps)
             
             return {
                 'statusCode': 200,
-                'body': json.dumps({
+                'result': {
                     'message': f'Successfully processed step {step}',
                     'allocations': allocations,
                     'resource_manager_response': response
-                })
+                }
             }
         else:
-            print("WARNING: RESOURCE_MANAGER_URL not configured")
+            logger.warning("RESOURCE_MANAGER_URL not configured")
             return {
                 'statusCode': 200,
-                'body': json.dumps({
+                'result': {
                     'message': 'Retrieved allocations but Resource Manager URL not configured',
                     'allocations': allocations
-                })
+                }
             }
         
     except Exception as e:
-        print(f"Error in lambda_handler: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in lambda_handler: %s", e)
         return {
             'statusCode': 500,
-            'body': json.dumps({'error': str(e)})
+            'result': {'error': str(e)}
         }
 
 
-def get_pending_allocations(step):
+def get_pending_allocations(step, submission_timestamps=None):
     """
     Retrieve pending allocations from DynamoDB for given step
     
+    When submission_handler passes the timestamps of the round, those
+    exact items are read from the table (see get_submitted_allocations).
+    Otherwise (manual trigger) uses a single query against the
+    step-status-index GSI (partition key `step`, sort key `timestamp`)
+    instead of one query per user, keeping the most recent pending
+    submission for each user.
+    
     Args:
         step: Step number
+        submission_timestamps: Optional dictionary mapping user_id to the
+                               timestamp of the submission to process
     
     Returns:
         Tuple of (allocations_dict, timestamps_dict) where:
         - allocations_dict: Dictionary mapping user_id to allocation_vector
         - timestamps_dict: Dictionary mapping user_id to timestamp
     """
+    if submission_timestamps:
+        return get_submitted_allocations(step, submission_timestamps)
+    
     allocations = {}
     timestamps = {}
     
-    for user_id in USER_IDS:
-        try:
-            # Query for most recent pending submission by this user for this step
-            response = table.query(
-                KeyConditionExpression=boto3.dynamodb.conditions.Key('user_id').eq(user_id),
-                FilterExpression=boto3.dynamodb.conditions.Attr('step').eq(step) & 
-                               boto3.dynamodb.conditions.Attr('status').eq('pending'),
-                ScanIndexForward=False,  # Most recent first
-                Limit=1
-            )
+    query_kwargs = {
+        'TableName': DYNAMODB_TABLE,
+        'IndexName': STEP_STATUS_INDEX,
+        'KeyConditionExpression': PENDING_KEY_EXPR,
+        'FilterExpression': PENDING_FILTER_EXPR,
+        # Only fetch the attributes we use (timestamp is a reserved word)
+        'ProjectionExpression': PENDING_PROJECTION,
+        'ExpressionAttributeNames': PENDING_EXPR_NAMES,
+        'ExpressionAttributeValues': {
+            ':step': {'N': str(step)},
+            ':status': {'S': 'pending'}
+        },
+        'ScanIndexForward': False,  # Most recent first
+        'Limit': len(USER_IDS) * 2
+    }
+    
+    try:
+        # Limit is applied before the filter, so keep paging until every
+        # user has a pending allocation or the index is exhausted
+        while len(allocations) < len(USER_IDS):
+            response = dynamodb_client.query(**query_kwargs)
             
-            if response['Items']:
-                item = response['Items'][0]
-                # Convert Decimal values to int for JSON serialization
-                allocation_vector = item['allocation_vector']
-                allocations[user_id] = [int(v) for v in allocation_vector]
-                timestamps[user_id] = item['timestamp']
-                print(f"Found allocation for {user_id}: {allocations[user_id]}")
-            else:
-                print(f"WARNING: No pending allocation found for {user_id} in step {step}")
-        
-        except Exception as e:
-            print(f"Error retrieving allocation for {user_id}: {e}")
+            for item in response['Items']:
+                user_id = item['user_id']['S']
+                if user_id in allocations or user_id not in USER_IDS:
+                    continue
+                # Raw AttributeValues hold numbers as strings, no Decimal involved
+                allocations[user_id] = [int(v['N']) for v in item['allocation_vector']['L']]
+                timestamps[user_id] = item['timestamp']['S']
+                logger.debug("Found allocation for %s: %s", user_id, allocations[user_id])
+            
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    except Exception as e:
+        logger.error("Error retrieving allocations for step %s: %s", step, e)
+    
+    for user_id in USER_IDS:
+        if user_id not in allocations:
+            logger.warning("No pending allocation found for %s in step %s", user_id, step)
+
+    # Keep allocations ordered by USER_IDS regardless of index order
+    allocations = {uid: allocations[uid] for uid in USER_IDS if uid in allocations}
+
+    return allocations, timestamps
+
+
+def get_submitted_allocations(step, submission_timestamps):
+    """
+    Read the submissions of a round by key with a strongly consistent read
+    
+    GSI queries are eventually consistent, and Lambda 2 runs right after
+    the last submission is written, so the index may still miss it. The
+    base table read by key sees every acknowledged write.
+    
+    Args:
+        step: Step number
+        submission_timestamps: Dictionary mapping user_id to timestamp
+    
+    Returns:
+        Same tuple as get_pending_allocations; submissions that are
+        missing or no longer pending are left out
+    """
+    allocations = {}
+    timestamps = {}
+    
+    request_items = {
+        DYNAMODB_TABLE: {
+            'Keys': [{'user_id': {'S': user_id}, 'timestamp': {'S': submission_timestamps[user_id]}}
+                     for user_id in USER_IDS if user_id in submission_timestamps],
+            'ProjectionExpression': SUBMITTED_PROJECTION,
+            'ExpressionAttributeNames': SUBMITTED_EXPR_NAMES,
+            'ConsistentRead': True
+        }
+    }
+    
+    try:
+        while request_items:
+            response = dynamodb_client.batch_get_item(RequestItems=request_items)
+            for item in response['Responses'].get(DYNAMODB_TABLE, []):
+                user_id = item['user_id']['S']
+                if item['status']['S'] != 'pending':
+                    continue
+                allocations[user_id] = [int(v['N']) for v in item['allocation_vector']['L']]
+                timestamps[user_id] = item['timestamp']['S']
+            request_items = response.get('UnprocessedKeys')
+    except Exception as e:
+        logger.error("Error retrieving allocations for step %s: %s", step, e)
+    
+    for user_id in USER_IDS:
+        if user_id not in allocations:
+            logger.warning("No pending allocation found for %s in step %s", user_id, step)
+    
+    allocations = {uid: allocations[uid] for uid in USER_IDS if uid in allocations}
     
     return allocations, timestamps
 
@@ -150,35 +269,33 @@ def send_to_resource_manager(allocations, step):
         base_url = RESOURCE_MANAGER_URL.rstrip('/')
         url = f"{base_url}/calculate_matrices"
         
-        print(f"Sending to Resource Manager: {url}")
-        print(f"Payload: {json.dumps(payload)}")
-        
         # Prepare request data
         data = json.dumps(payload).encode('utf-8')
-        req = urllib.request.Request(
+        
+        logger.info("Sending to Resource Manager: %s", url)
+        logger.debug("Payload: %s", data)
+        
+        # Send request over the pooled connection with timeout
+        response = _http.request(
+            'POST',
             url,
-            data=data,
+            body=data,
             headers={'Content-Type': 'application/json'},
-            method='POST'
+            timeout=30.0
         )
         
-        # Send request with timeout
-        # urlopen automatically raises HTTPError for 4xx/5xx status codes
-        try:
-            with urllib.request.urlopen(req, timeout=30) as response:
-                status_code = response.getcode()
-                response_data = response.read().decode('utf-8')
-                result = json.loads(response_data)
-                print(f"Resource Manager response: {status_code}")
-                return result
-        except urllib.error.HTTPError as e:
-            # HTTP error (4xx, 5xx)
-            error_body = e.read().decode('utf-8') if e.fp else str(e)
-            print(f"HTTP Error {e.code}: {error_body}")
-            raise
+        # urllib3 does not raise for 4xx/5xx status codes
+        if response.status >= 400:
+            error_body = response.data.decode('utf-8')
+            logger.error("HTTP Error %s: %s", response.status, error_body)
+            raise RuntimeError(f"Resource Manager returned HTTP {response.status}")
+        
+        result = json.loads(response.data.decode('utf-8'))
+        logger.info("Resource Manager response: %s", response.status)
+        return result
         
     except Exception as e:
-        print(f"Error sending to Resource Manager: {e}")
+        logger.error("Error sending to Resource Manager: %s", e)
         raise
 
 
@@ -186,34 +303,87 @@ def update_allocation_status(allocations, timestamps, new_status):
     """
     Update status of allocations in DynamoDB
     
+    All updates are written in a single transaction (one round trip), so
+    either every allocation of the step changes status or none does.
+    
     Args:
         allocations: Dictionary of allocations (keys are user_ids)
         timestamps: Dictionary of timestamps (keys are user_ids)
         new_status: New status value (e.g., 'processed')
     """
+    transact_items = []
     for user_id in allocations.keys():
+        if user_id not in timestamps:
+            logger.warning("No timestamp found for %s, skipping status update", user_id)
+            continue
+        
+        # Update using both partition key (user_id) and sort key (timestamp)
+        transact_items.append({
+            'Update': {
+                'TableName': DYNAMODB_TABLE,
+                'Key': {
+                    'user_id': {'S': user_id},
+                    'timestamp': {'S': timestamps[user_id]}
+                },
+                'UpdateExpression': 'SET #status = :status',
+                'ExpressionAttributeNames': {'#status': 'status'},
+                'ExpressionAttributeValues': {':status': {'S': new_status}}
+            }
+        })
+    
+    if not transact_items:
+        return
+    
+    try:
+        dynamodb_client.transact_write_items(TransactItems=transact_items)
+        logger.debug("Updated status for %s to %s",
+                     [item['Update']['Key']['user_id']['S'] for item in transact_items],
+                     new_status)
+    except Exception as e:
+        logger.error("Error updating allocation status to %s: %s", new_status, e)
+
+
+def reset_submission_counter(step, timestamps):
+    """
+    Remove the processed submissions from the step counter
+    
+    Each processed user is taken out of the counter on their own, and only
+    if the counter still holds the processed timestamp for them. A user who
+    submitted again while the round was processed stays counted for the
+    next round, while every other processed user is cleared.
+    
+    Args:
+        step: Step number
+        timestamps: Dictionary of processed timestamps (keys are user_ids)
+    """
+    for user_id, timestamp in timestamps.items():
         try:
-            if user_id not in timestamps:
-                print(f"WARNING: No timestamp found for {user_id}, skipping status update")
-                continue
-            
-            # Update using both partition key (user_id) and sort key (timestamp)
-            response = table.update_item(
+            dynamodb_client.update_item(
+                TableName=DYNAMODB_TABLE,
                 Key={
-                    'user_id': user_id,
-                    'timestamp': timestamps[user_id]
+                    'user_id': {'S': COUNTER_USER_ID},
+                    'timestamp': {'S': f'step#{step}'}
                 },
-                UpdateExpression='SET #status = :status',
-                ExpressionAttributeNames={'#status': 'status'},
-                ExpressionAttributeValues={':status': new_status}
+                UpdateExpression=RESET_SUBMISSION_UPDATE_EXPR,
+                ConditionExpression=RESET_SUBMISSION_CONDITION_EXPR,
+                ExpressionAttributeNames={'#user_ts': f'ts_{user_id}'},
+                ExpressionAttributeValues={
+                    ':users': {'SS': [user_id]},
+                    ':ts': {'S': timestamp}
+                }
             )
-            print(f"Updated status for {user_id} to {new_status}")
+            logger.debug("Reset %s on the submission counter for step %s", user_id, step)
+        except dynamodb_client.exceptions.ConditionalCheckFailedException:
+            logger.info("%s submitted again for step %s, keeping it counted", user_id, step)
         except Exception as e:
-            print(f"Error updating status for {user_id}: {e}")
+            logger.error("Error resetting %s on the submission counter for step %s: %s",
+                         user_id, step, e)
 
 
 # For local testing
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    
     # Mock event
     test_event = {
         'step': 1,
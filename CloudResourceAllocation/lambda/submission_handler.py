@@ -5,23 +5,56 @@ When all 3 users have submitted, triggers Lambda 2
 """
 
 import json
+import logging
 import boto3
 import os
 from datetime import datetime
 from decimal import Decimal
+from botocore.config import Config
 
 # Environment variables (set in Lambda configuration)
 DYNAMODB_TABLE = os.environ.get('DYNAMODB_TABLE', 'ResourceAllocations')
 LAMBDA_FUNCTION_2 = os.environ.get('LAMBDA_FUNCTION_2', 'get-and-send')
 REGION = os.environ.get('AWS_REGION', 'us-east-1')
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb', region_name=REGION)
-lambda_client = boto3.client('lambda', region_name=REGION)
-table = dynamodb.Table(DYNAMODB_TABLE)
+# INFO by default; set LOG_LEVEL=DEBUG to log events and per-record details
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
 USER_IDS = ['S1', 'S2', 'S3']
 
+# Shared client configuration: bounded retries/timeouts keep worst-case
+# latency within the Lambda timeout
+BOTO_CONFIG = Config(
+    max_pool_connections=max(10, 2 * len(USER_IDS)),
+    retries={'max_attempts': 2, 'mode': 'standard'},
+    connect_timeout=2,
+    read_timeout=5
+)
+
+# Initialize AWS clients (module scope, so warm invocations reuse the pools)
+# The table resource is only used for its batch writer; everything else
+# goes through the low-level client
+dynamodb = boto3.resource('dynamodb', region_name=REGION, config=BOTO_CONFIG)
+dynamodb_client = boto3.client('dynamodb', region_name=REGION, config=BOTO_CONFIG)
+# Event invokes return immediately, so fail fast instead of retrying
+lambda_client = boto3.client('lambda', region_name=REGION,
+                             config=BOTO_CONFIG.merge(Config(
+                                 connect_timeout=1, read_timeout=2,
+                                 retries={'total_max_attempts': 1, 'mode': 'standard'})))
+table = dynamodb.Table(DYNAMODB_TABLE)
+
+# Bookkeeping rows share the table but carry no `step` attribute, so they
+# never appear in the step-status-index GSI:
+# - counter rows (one per step) track which users submitted in the round
+# - marker rows record which submission rounds already triggered Lambda 2
+COUNTER_USER_ID = '__counter__'
+TRIGGER_MARKER_USER_ID = '__trigger__'
+
+# Precompiled expression for recording a submission on the step counter
+RECORD_SUBMISSION_UPDATE_EXPR = 'ADD submitted_users :users SET #user_ts = :ts'
+RECORD_SUBMISSION_CONDITION_EXPR = 'attribute_not_exists(#user_ts) OR #user_ts <= :ts'
+
 
 def lambda_handler(event, context):
     """
@@ -36,9 +69,10 @@ def lambda_handler(event, context):
         ]
     }
     """
-    print(f"Received event: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Received event: %s", json.dumps(event))
     
-    processed_count = 0
+    items = []
     
     # Process each SQS record
     for record in event['Records']:
@@ -47,95 +81,273 @@ def lambda_handler(event, context):
             message = json.loads(record['body'])
             
             user_id = message['user_id']
+            if user_id not in USER_IDS:
+                # Unknown ids would corrupt the step counter's user set
+                logger.error("Rejecting allocation from unknown user %s", user_id)
+                continue
+            
             allocation_vector = message['allocation_vector']
             expected_utility = message['expected_utility']
             timestamp = message.get('timestamp', datetime.utcnow().isoformat())
             step = message.get('step', 1)
             
-            print(f"Processing allocation for {user_id}, step {step}")
+            logger.debug("Processing allocation for %s, step %s", user_id, step)
             
-            # Store in DynamoDB
-            item = {
+            items.append({
                 'user_id': user_id,
                 'timestamp': timestamp,
                 'allocation_vector': allocation_vector,
                 'expected_utility': Decimal(str(expected_utility)),  # Convert float to Decimal for DynamoDB
                 'step': step,
                 'status': 'pending'
-            }
-            
-            table.put_item(Item=item)
-            print(f"Stored allocation for {user_id} in DynamoDB")
-            
-            processed_count += 1
-            
-            # Check if all users have submitted for this step
-            if check_all_users_submitted(step):
-                print(f"All users submitted for step {step}, triggering Lambda 2")
-                trigger_lambda_2(step)
+            })
             
         except Exception as e:
-            print(f"Error processing record: {e}")
+            logger.error("Error processing record: %s", e)
             # Continue processing other records
             continue
     
+    # SQS delivers at least once: only write records that are not stored
+    # yet, so a redelivery cannot flip a processed allocation back to pending
+    stored_statuses = get_stored_statuses([(item['user_id'], item['timestamp']) for item in items])
+    unique_items = list({(item['user_id'], item['timestamp']): item for item in items}.values())
+    new_items = [item for item in unique_items
+                 if (item['user_id'], item['timestamp']) not in stored_statuses]
+    if len(new_items) < len(items):
+        logger.info("Skipping %d already stored allocations", len(items) - len(new_items))
+    
+    # Buffer all records into BatchWriteItem requests (up to 25 items each)
+    # instead of one PutItem round-trip per record
+    with table.batch_writer(overwrite_by_pkeys=['user_id', 'timestamp']) as batch:
+        for item in new_items:
+            batch.put_item(Item=item)
+    
+    processed_count = len(new_items)
+    logger.info("Stored %d allocations in DynamoDB", processed_count)
+    
+    # Writes are durable once the batch writer has flushed, so only now
+    # record each submission on its step counter; the last update per step
+    # tells whether that step's round is complete. Stored submissions whose
+    # round is still pending are recorded again, so a redelivery after a
+    # failed recording or trigger can complete the round
+    pending_items = [item for item in unique_items
+                     if stored_statuses.get((item['user_id'], item['timestamp']), 'pending') == 'pending']
+    completed_rounds = {}
+    for item in pending_items:
+        submission_timestamps = record_submission(item['step'], item['user_id'],
+                                                  item['timestamp'])
+        if submission_timestamps:
+            completed_rounds[item['step']] = submission_timestamps
+    
+    # Trigger in step order, so a batch spanning steps 1 and 2 triggers
+    # them in sequence
+    triggered_steps = []
+    for step in sorted(completed_rounds):
+        submission_timestamps = completed_rounds[step]
+        
+        # Claim this round before invoking, so concurrent or redelivered
+        # batches observing the same submissions trigger Lambda 2 only once
+        marker_key = get_trigger_marker_key(step, submission_timestamps)
+        if not claim_trigger(marker_key):
+            logger.info("Step %s already triggered for these submissions, skipping", step)
+            continue
+        
+        logger.info("All users submitted for step %s, triggering Lambda 2", step)
+        try:
+            trigger_lambda_2(step, submission_timestamps)
+        except Exception:
+            # Release the claim so a redelivery of this batch, whose
+            # submissions are still pending, can claim and trigger again
+            release_trigger(marker_key)
+            raise
+        triggered_steps.append(step)
+    
     return {
         'statusCode': 200,
-        'body': json.dumps({
+        'result': {
             'message': f'Processed {processed_count} allocations',
-            'processed': processed_count
-        })
+            'processed': processed_count,
+            'triggered_steps': triggered_steps
+        }
+    }
+
+
+def get_counter_key(step):
+    """Get the primary key of the submission counter row for a step"""
+    return {
+        'user_id': {'S': COUNTER_USER_ID},
+        'timestamp': {'S': f'step#{step}'}
     }
 
 
-def check_all_users_submitted(step):
+def record_submission(step, user_id, timestamp):
     """
-    Check if all 3 users have submitted allocations for given step
+    Record a user's submission on the step counter with one atomic update
+    
+    The counter holds the set of users that submitted in the current round
+    plus each user's latest submission timestamp, so completeness is known
+    from a single UpdateItem instead of one query per user. Adding to a set
+    is idempotent and the condition accepts the timestamp already recorded
+    for the user, so replaying a submission succeeds again, while submissions
+    older than the recorded one are ignored. Any other error is raised so the
+    SQS batch is retried.
     
     Args:
-        step: Step number to check
+        step: Step number
+        user_id: User identifier
+        timestamp: Timestamp of the submission
     
     Returns:
-        True if all users have submitted, False otherwise
+        Dictionary mapping user_id to the timestamp of their latest
+        submission if all users have submitted, None otherwise
     """
     try:
-        submitted_users = set()
-        
-        for user_id in USER_IDS:
-            # Query for most recent submission by this user for this step
-            response = table.query(
-                KeyConditionExpression=boto3.dynamodb.conditions.Key('user_id').eq(user_id),
-                FilterExpression=boto3.dynamodb.conditions.Attr('step').eq(step) & 
-                               boto3.dynamodb.conditions.Attr('status').eq('pending'),
-                ScanIndexForward=False,  # Most recent first
-                Limit=1
-            )
-            
-            if response['Items']:
-                submitted_users.add(user_id)
-        
-        all_submitted = len(submitted_users) == len(USER_IDS)
-        print(f"Step {step} - Submitted: {submitted_users}, All submitted: {all_submitted}")
-        
-        return all_submitted
-        
+        response = dynamodb_client.update_item(
+            TableName=DYNAMODB_TABLE,
+            Key=get_counter_key(step),
+            UpdateExpression=RECORD_SUBMISSION_UPDATE_EXPR,
+            ConditionExpression=RECORD_SUBMISSION_CONDITION_EXPR,
+            ExpressionAttributeNames={'#user_ts': f'ts_{user_id}'},
+            ExpressionAttributeValues={
+                ':users': {'SS': [user_id]},
+                ':ts': {'S': timestamp}
+            },
+            ReturnValues='ALL_NEW'
+        )
+    except dynamodb_client.exceptions.ConditionalCheckFailedException:
+        logger.info("Newer submission already recorded for %s in step %s", user_id, step)
+        return None
     except Exception as e:
-        print(f"Error checking submissions: {e}")
+        logger.error("Error recording submission for %s: %s", user_id, e)
+        raise
+    
+    attributes = response['Attributes']
+    submitted_users = attributes['submitted_users']['SS']
+    all_submitted = set(USER_IDS) <= set(submitted_users)
+    logger.info("Step %s - Submitted: %s, All submitted: %s",
+                step, sorted(submitted_users), all_submitted)
+    
+    if not all_submitted:
+        return None
+    
+    return {uid: attributes[f'ts_{uid}']['S'] for uid in USER_IDS}
+
+
+def get_stored_statuses(keys):
+    """
+    Find which (user_id, timestamp) keys are already stored in DynamoDB
+    
+    Args:
+        keys: List of (user_id, timestamp) tuples
+    
+    Returns:
+        Dictionary mapping each key that already exists to its status
+    """
+    stored = {}
+    unique_keys = list(dict.fromkeys(keys))
+    
+    # BatchGetItem accepts at most 100 keys per request
+    for i in range(0, len(unique_keys), 100):
+        request_items = {
+            DYNAMODB_TABLE: {
+                'Keys': [{'user_id': {'S': user_id}, 'timestamp': {'S': timestamp}}
+                         for user_id, timestamp in unique_keys[i:i + 100]],
+                'ProjectionExpression': 'user_id, #ts, #s',
+                'ExpressionAttributeNames': {'#ts': 'timestamp', '#s': 'status'}
+            }
+        }
+        
+        while request_items:
+            response = dynamodb_client.batch_get_item(RequestItems=request_items)
+            for item in response['Responses'].get(DYNAMODB_TABLE, []):
+                stored[(item['user_id']['S'], item['timestamp']['S'])] = item['status']['S']
+            request_items = response.get('UnprocessedKeys')
+    
+    return stored
+
+
+def get_trigger_marker_key(step, submission_timestamps):
+    """
+    Build the sort key of the trigger marker for a submission round
+    
+    The round is identified by the step and the timestamps of the
+    submissions it contains, so a new round for the same step can still
+    trigger while redeliveries of the current one cannot.
+    
+    Args:
+        step: Step number
+        submission_timestamps: Dictionary mapping user_id to timestamp
+    
+    Returns:
+        Marker sort key string
+    """
+    round_key = '|'.join(submission_timestamps[user_id] for user_id in USER_IDS)
+    return f'step#{step}#{round_key}'
+
+
+def claim_trigger(marker_key):
+    """
+    Atomically record that a submission round has triggered Lambda 2
+    
+    Args:
+        marker_key: Marker sort key from get_trigger_marker_key()
+    
+    Returns:
+        True if this call claimed the round, False if it was already claimed
+    """
+    try:
+        dynamodb_client.put_item(
+            TableName=DYNAMODB_TABLE,
+            Item={
+                'user_id': {'S': TRIGGER_MARKER_USER_ID},
+                'timestamp': {'S': marker_key},
+                'status': {'S': 'fired'}
+            },
+            ConditionExpression='attribute_not_exists(user_id)'
+        )
+        return True
+    except dynamodb_client.exceptions.ConditionalCheckFailedException:
         return False
 
 
-def trigger_lambda_2(step):
+def release_trigger(marker_key):
+    """
+    Delete a trigger marker so the round can be triggered again
+    
+    Errors are raised: a marker left behind would block the round for
+    good, while failing the batch lets SQS redeliver it (recording the
+    same submissions again is idempotent).
+    """
+    try:
+        dynamodb_client.delete_item(
+            TableName=DYNAMODB_TABLE,
+            Key={
+                'user_id': {'S': TRIGGER_MARKER_USER_ID},
+                'timestamp': {'S': marker_key}
+            }
+        )
+    except Exception as e:
+        logger.error("Error releasing trigger marker %s: %s", marker_key, e)
+        raise
+
+
+def trigger_lambda_2(step, submission_timestamps=None):
     """
     Trigger Lambda Function 2 (Get and Send)
     
     Args:
         step: Step number to process
+        submission_timestamps: Dictionary mapping user_id to the timestamp
+                               of the submission in the completed round,
+                               so Lambda 2 reads those items by key
     """
     try:
         payload = {
             'step': step,
             'trigger_source': 'submission_handler'
         }
+        if submission_timestamps:
+            payload['timestamps'] = submission_timestamps
         
         response = lambda_client.invoke(
             FunctionName=LAMBDA_FUNCTION_2,
@@ -143,16 +355,18 @@ def trigger_lambda_2(step):
             Payload=json.dumps(payload)
         )
         
-        print(f"Triggered Lambda 2: {response['StatusCode']}")
+        logger.info("Triggered Lambda 2: %s", response['StatusCode'])
         return response
         
     except Exception as e:
-        print(f"Error triggering Lambda 2: {e}")
+        logger.error("Error triggering Lambda 2: %s", e)
         raise
 
 
 # For local testing
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    
     # Mock SQS event
     test_event = {
         'Records': [
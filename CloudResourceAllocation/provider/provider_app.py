@@ -5,31 +5,79 @@ Receives allocations, calculates matrices, and sends results to users
 
 import sys
 import os
+import logging
+import threading
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from flask import Flask, request, jsonify
+import numpy as np
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from provider.resource_manager import ResourceManager
 from utils.config import AWS_CONFIG, USER_IDS
+from utils.json_provider import OrjsonProvider, ORJSON_OPTIONS, orjson_response
+
+# INFO by default; set LOG_LEVEL=DEBUG to log the full matrices per request
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'),
+                    format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+log = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Initialize Resource Manager
 manager = ResourceManager()
 
-# Store state
+# Keep-alive session shared by all outbound requests to users
+_session = requests.Session()
+_session.mount('http://', HTTPAdapter(pool_connections=len(USER_IDS),
+                                      pool_maxsize=len(USER_IDS)))
+
+# Users with a configured URL, resolved once at import (ordered by USER_IDS)
+_ACTIVE_USERS = tuple(
+    (user_id, AWS_CONFIG['user_urls'][user_id].rstrip('/'))
+    for user_id in USER_IDS
+    if AWS_CONFIG['user_urls'].get(user_id)
+)
+for _user_id in USER_IDS:
+    if not AWS_CONFIG['user_urls'].get(_user_id):
+        log.warning("URL not configured for %s", _user_id)
+
+# Store state; handlers run on several threads under gunicorn, so every
+# multi-field read or write holds state_lock to stay consistent
 state = {
     'step': 0,
     'allocations': {},
     'results': None,
-    'step1_time_matrix': None  # Store for Step 2 calculation
+    'step1_time_matrix': None  # ndarray kept for the Step 2 calculation
 }
+state_lock = threading.Lock()
+
+
+def _post_matrices(user_id, url, payload):
+    """POST matrices to one user, returning that user's response"""
+    try:
+        response = _session.post(
+            url,
+            data=orjson.dumps(payload, option=ORJSON_OPTIONS),
+            headers={'Content-Type': 'application/json'},
+            timeout=10
+        )
+        log.info("Sent matrices to %s: %s", user_id, response.status_code)
+        return orjson.loads(response.content)
+    except Exception as e:
+        log.error("Error sending to %s: %s", user_id, e)
+        return {'error': str(e)}
 
 
 def send_matrices_to_users(results, step):
     """
     Send T and E matrices to all users
     
+    The POSTs are dispatched concurrently over a pooled keep-alive session.
+    
     Args:
         results: Results from ResourceManager.process_allocations()
         step: Step number (1 or 2)
@@ -37,36 +85,30 @@ def send_matrices_to_users(results, step):
     Returns:
         Dictionary of responses from users
     """
-    responses = {}
+    requests_to_send = []
     
-    for user_id in USER_IDS:
-        user_url = AWS_CONFIG['user_urls'].get(user_id)
+    for user_id, user_url in _ACTIVE_USERS:
+        user_result = results['user_results'][user_id]
         
-        if not user_url:
-            print(f"WARNING: URL not configured for {user_id}")
-            continue
+        payload = {
+            'time_vector': user_result['time_vector'],
+            'expense_vector': user_result['expense_vector'],
+            'step': step
+        }
         
-        try:
-            user_result = results['user_results'][user_id]
-            
-            payload = {
-                'time_vector': user_result['time_vector'],
-                'expense_vector': user_result['expense_vector'],
-                'step': step
-            }
-            
-            response = requests.post(
-                f"{user_url}/receive_matrices",
-                json=payload,
-                timeout=10
-            )
-            
-            responses[user_id] = response.json()
-            print(f"Sent matrices to {user_id}: {response.status_code}")
-            
-        except Exception as e:
-            print(f"Error sending to {user_id}: {e}")
-            responses[user_id] = {'error': str(e)}
+        requests_to_send.append((user_id, f"{user_url}/receive_matrices", payload))
+    
+    responses = {}
+    if not requests_to_send:
+        return responses
+    
+    with ThreadPoolExecutor(max_workers=len(requests_to_send)) as executor:
+        futures = {
+            executor.submit(_post_matrices, user_id, url, payload): user_id
+            for user_id, url, payload in requests_to_send
+        }
+        for future in as_completed(futures):
+            responses[futures[future]] = future.result()
     
     return responses
 
@@ -117,7 +159,7 @@ def calculate_matrices():
         if not allocations:
             return jsonify({'error': 'Missing allocations'}), 400
         
-        print(f"\n=== Calculate Matrices Request (Step {step}) ===")
+        log.info("=== Calculate Matrices Request (Step %s) ===", step)
         
         # Validate all users present
         missing_users = [uid for uid in USER_IDS if uid not in allocations]
@@ -129,19 +171,20 @@ def calculate_matrices():
         multiplexing_info = manager.check_multiplexing(results['allocation_matrix'])
         
         # Store state
-        state['allocations'] = allocations
-        state['results'] = results
-        state['step'] = step
-        
-        if step == 1:
-            state['step1_time_matrix'] = results['time_matrix']
+        with state_lock:
+            state['allocations'] = allocations
+            state['results'] = results
+            state['step'] = step
+            
+            if step == 1:
+                state['step1_time_matrix'] = np.asarray(results['time_matrix'], dtype=np.float64)
         
         # Send matrices to users if URLs configured
         user_responses = {}
-        if any(AWS_CONFIG['user_urls'].values()):
+        if _ACTIVE_USERS:
             user_responses = send_matrices_to_users(results, step)
         
-        return jsonify({
+        body = {
             'allocation_matrix': results['allocation_matrix'],
             'time_matrix': results['time_matrix'],
             'expense_matrix': results['expense_matrix'],
@@ -149,12 +192,13 @@ def calculate_matrices():
             'multiplexing': multiplexing_info,
             'step': step,
             'user_responses': user_responses
-        })
+        }
+        
+        # Encode straight to bytes, skipping jsonify's str round-trip
+        return orjson_response(body)
         
     except Exception as e:
-        print(f"Error in calculate_matrices: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error in calculate_matrices: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -177,18 +221,23 @@ def prepare_step2():
     }
     """
     try:
-        if not state['step1_time_matrix']:
+        with state_lock:
+            step1_time_matrix = state['step1_time_matrix']
+        
+        if step1_time_matrix is None:
             return jsonify({'error': 'Step 1 must be completed first'}), 400
         
-        print(f"\n=== Preparing Step 2 ===")
+        log.info("=== Preparing Step 2 ===")
         
-        # Calculate updated execution times
-        updated_times = manager.calculate_step2_execution_times(state['step1_time_matrix'])
+        # Calculate updated execution times on the stored array (replaced,
+        # never modified in place, so it is safe to read outside the lock)
+        updated_times = manager.calculate_step2_execution_times(
+            step1_time_matrix, as_array=True)
         
-        # Format as dictionary for each user
+        # Format as dictionary for each user (lists only at the response)
         updated_execution_times = {}
         for i, user_id in enumerate(USER_IDS):
-            updated_execution_times[user_id] = updated_times[i]
+            updated_execution_times[user_id] = updated_times[i].tolist()
         
         return jsonify({
             'updated_execution_times': updated_execution_times,
@@ -197,32 +246,43 @@ def prepare_step2():
         })
         
     except Exception as e:
-        print(f"Error in prepare_step2: {e}")
+        log.exception("Error in prepare_step2: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/get_results', methods=['GET'])
 def get_results():
     """Get complete results"""
-    if not state['results']:
+    with state_lock:
+        step = state['step']
+        allocations = state['allocations']
+        results = state['results']
+    
+    if not results:
         return jsonify({'error': 'No results available yet'}), 404
     
     return jsonify({
-        'step': state['step'],
-        'allocations': state['allocations'],
-        'allocation_matrix': state['results']['allocation_matrix'],
-        'time_matrix': state['results']['time_matrix'],
-        'expense_matrix': state['results']['expense_matrix'],
-        'user_results': state['results']['user_results']
+        'step': step,
+        'allocations': allocations,
+        'allocation_matrix': results['allocation_matrix'],
+        'time_matrix': results['time_matrix'],
+        'expense_matrix': results['expense_matrix'],
+        'user_results': results['user_results']
     })
 
 
+# Production: serve with gunicorn using threaded workers, e.g.
+#   gunicorn -w 1 -k gthread --threads 8 --timeout 30 -b 0.0.0.0:5001 provider.provider_app:app
+# Keep a single worker process: `state` lives in process memory, so Step 1
+# results must be visible to the /prepare_step2 request that follows.
+# Running this module directly starts the Werkzeug development server.
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
+    debug = os.environ.get('FLASK_DEBUG') == '1'
     print(f"\n{'='*60}")
-    print(f"Starting Resource Manager Flask App")
+    print(f"Starting Resource Manager Flask App (development server)")
     print(f"Port: {port}")
     print(f"{'='*60}\n")
     
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=debug, threaded=True)
 
@@ -5,19 +5,31 @@ Calculates actual execution times and expenses accounting for multiplexing
 
 import sys
 import os
+import logging
+import numpy as np
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.calculations import (
-    calculate_actual_execution_matrix,
-    calculate_actual_expense_matrix,
-    print_matrix
+    calculate_actual_matrices,
+    format_matrix,
+    update_execution_times_step2
 )
 from utils.config import (
     EXECUTION_TIME_MATRIX,
+    EXECUTION_TIME_ARRAY,
     RESOURCE_PRICES,
+    RESOURCE_PRICES_ARRAY,
+    TP_MATRIX,
     USER_IDS
 )
-from typing import List, Dict, Tuple
+from typing import List, Dict
+
+
+# Static inputs as read-only arrays shared by every request
+_BASE = EXECUTION_TIME_ARRAY
+_PRICES = RESOURCE_PRICES_ARRAY
+
+log = logging.getLogger(__name__)
 
 
 class ResourceManager:
@@ -31,8 +43,13 @@ class ResourceManager:
         self.resource_prices = RESOURCE_PRICES
         self.user_ids = USER_IDS
         
-        print("\n=== Resource Manager Initialized ===")
-        print(f"Managing {len(self.user_ids)} users and {len(self.resource_prices)} resources")
+        # Read-only NumPy arrays of the static inputs (shared, never copied)
+        self._base = _BASE
+        self._prices = _PRICES
+        
+        log.info("=== Resource Manager Initialized ===")
+        log.info("Managing %d users and %d resources",
+                 len(self.user_ids), len(self.resource_prices))
     
     def process_allocations(self, 
                           allocations: Dict[str, List[int]]) -> Dict[str, Dict]:
@@ -50,39 +67,35 @@ class ResourceManager:
             - expense_matrix: Actual expense matrix (n x m)
             - user_results: Dict mapping user_id to (time_vector, expense_vector)
         """
-        print(f"\n--- Processing Allocations ---")
+        log.debug("--- Processing Allocations ---")
         
         # Validate we have all users
         if len(allocations) != len(self.user_ids):
             raise ValueError(f"Expected {len(self.user_ids)} allocations, got {len(allocations)}")
         
         # Build allocation matrix (ordered by user_ids)
-        allocation_matrix = []
         for user_id in self.user_ids:
             if user_id not in allocations:
                 raise ValueError(f"Missing allocation for {user_id}")
-            allocation_matrix.append(allocations[user_id])
-        
-        print("\nAllocation Matrix:")
-        for i, user_id in enumerate(self.user_ids):
-            print(f"  {user_id}: {allocation_matrix[i]}")
-        
-        # Calculate actual execution times (with multiplexing)
-        time_matrix = calculate_actual_execution_matrix(
-            allocation_matrix,
-            self.base_execution_times
-        )
-        
-        # Calculate expenses
-        expense_matrix = calculate_actual_expense_matrix(
-            allocation_matrix,
-            self.base_execution_times,
-            self.resource_prices
-        )
-        
-        # Print matrices
-        print_matrix(time_matrix, "Actual Execution Time Matrix (tij)", precision=2)
-        print_matrix(expense_matrix, "Expense Matrix (eij)", precision=2)
+        A = np.asarray([allocations[u] for u in self.user_ids], dtype=np.int8)
+        allocation_matrix = A.tolist()
+        
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Allocation Matrix:\n%s", "\n".join(
+                f"  {user_id}: {allocation_matrix[i]}"
+                for i, user_id in enumerate(self.user_ids)))
+        
+        # Actual execution times (with multiplexing) and expenses, the
+        # expenses from the price-weighted times precomputed in the config
+        time_matrix, expense_matrix = calculate_actual_matrices(
+            A, self._base, self._prices, price_weighted_times=TP_MATRIX)
+        time_matrix = time_matrix.tolist()
+        expense_matrix = expense_matrix.tolist()
+        
+        # Log matrices (formatting is skipped unless DEBUG is enabled)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(format_matrix(time_matrix, "Actual Execution Time Matrix (tij)", precision=2))
+            log.debug(format_matrix(expense_matrix, "Expense Matrix (eij)", precision=2))
         
         # Prepare results for each user
         user_results = {}
@@ -94,9 +107,9 @@ class ResourceManager:
                 'total_expense': sum(expense_matrix[i])
             }
             
-            print(f"\n{user_id} Results:")
-            print(f"  Max time: {user_results[user_id]['max_time']:.2f}s")
-            print(f"  Total expense: {user_results[user_id]['total_expense']:.2f}€")
+            log.debug("%s Results: max time %.2fs, total expense %.2f€", user_id,
+                      user_results[user_id]['max_time'],
+                      user_results[user_id]['total_expense'])
         
         return {
             'allocation_matrix': allocation_matrix,
@@ -115,62 +128,48 @@ class ResourceManager:
         Returns:
             Dictionary with multiplexing information
         """
-        m_resources = len(allocation_matrix[0])
+        A = np.asarray(allocation_matrix)
+        counts = A.sum(axis=0)
         multiplexed = {}
         
-        for j in range(m_resources):
-            count = sum(allocation_matrix[i][j] for i in range(len(allocation_matrix)))
-            if count > 1:
-                users = [self.user_ids[i] for i in range(len(allocation_matrix)) 
-                        if allocation_matrix[i][j] == 1]
-                multiplexed[f'R{j+1}'] = {
-                    'count': count,
-                    'users': users
-                }
+        for j in np.where(counts > 1)[0]:
+            users = [self.user_ids[i] for i in np.where(A[:, j] == 1)[0]]
+            multiplexed[f'R{j+1}'] = {
+                'count': int(counts[j]),
+                'users': users
+            }
         
         if multiplexed:
-            print(f"\n--- Multiplexed Resources ---")
+            log.debug("--- Multiplexed Resources ---")
             for resource, info in multiplexed.items():
-                print(f"{resource}: {info['count']} users ({', '.join(info['users'])})")
+                log.debug("%s: %d users (%s)", resource, info['count'], ', '.join(info['users']))
         else:
-            print(f"\n--- No Resource Multiplexing ---")
+            log.debug("--- No Resource Multiplexing ---")
         
         return multiplexed
     
     def calculate_step2_execution_times(self, 
-                                       time_matrix_step1: List[List[float]]) -> List[List[float]]:
+                                       time_matrix_step1: List[List[float]],
+                                       as_array: bool = False) -> List[List[float]]:
         """
         Calculate updated execution times for Step 2
         
         Formula: t_new_ij = t̂_ij + Σ(tij)/n
         
         Args:
-            time_matrix_step1: Actual time matrix from Step 1
+            time_matrix_step1: Actual time matrix from Step 1 (list or ndarray)
+            as_array: Return the NumPy array instead of nested lists
         
         Returns:
             Updated base execution time matrix for Step 2
         """
-        n_tasks = len(time_matrix_step1)
-        m_resources = len(time_matrix_step1[0])
-        
-        updated_times = []
-        
-        for i in range(n_tasks):
-            task_times = []
-            for j in range(m_resources):
-                # Calculate average of actual times for this resource
-                sum_times = sum(time_matrix_step1[k][j] for k in range(n_tasks))
-                avg_time = sum_times / n_tasks
-                
-                # Update formula: new base time = original base time + average
-                new_time = self.base_execution_times[i][j] + avg_time
-                task_times.append(new_time)
-            updated_times.append(task_times)
-        
-        print(f"\n--- Updated Execution Times for Step 2 ---")
-        print_matrix(updated_times, "New Base Execution Times (t̂_new)", precision=2)
-        
-        return updated_times
+        updated_times = update_execution_times_step2(time_matrix_step1, self._base)
+        
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("--- Updated Execution Times for Step 2 ---")
+            log.debug(format_matrix(updated_times, "New Base Execution Times (t̂_new)", precision=2))
+        
+        return updated_times if as_array else updated_times.tolist()
 
 
 def test_resource_manager():
@@ -203,5 +202,6 @@ def test_resource_manager():
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s', stream=sys.stdout)
     test_resource_manager()
 
@@ -33,6 +33,10 @@ TESTS = {
         'desc': 'Test complete flow (Step 1 + Step 2)',
         'cmd': 'python3 tests/test_local_complete.py'
     },
+    'unit': {
+        'desc': 'Optimizer and Lambda unit tests (needs pytest, moto)',
+        'cmd': 'python3 -m pytest -q tests/test_optimizer.py tests/test_submission_handler.py'
+    },
     'all': {
         'desc': 'Run all tests',
         'cmd': None  # Special case
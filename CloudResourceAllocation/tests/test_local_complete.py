@@ -5,6 +5,8 @@ Tests both Step 1 and Step 2 of the resource allocation game
 
 import sys
 import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from user.optimizer import UserOptimizer
@@ -20,6 +22,11 @@ def print_separator(title):
     print("="*80 + "\n")
 
 
+def _optimize_one(optimizer, custom_times=None):
+    """Run one user's optimization (users are independent of each other)"""
+    return optimizer.optimize_step1(custom_execution_times=custom_times)
+
+
 def test_complete_flow():
     """Test complete flow including Step 1 and Step 2"""
     
@@ -31,14 +38,14 @@ def test_complete_flow():
     # Phase 1.1: User Optimization
     print("\n### PHASE 1.1: User Optimization (Independent) ###\n")
     
-    user_optimizers = {}
+    user_optimizers = {user_id: UserOptimizer(user_id) for user_id in USER_IDS}
     allocations_step1 = {}
     
-    for user_id in USER_IDS:
-        print(f"\n--- Optimizing {user_id} ---")
-        optimizer = UserOptimizer(user_id)
-        allocation, expected_utility = optimizer.optimize_step1()
-        user_optimizers[user_id] = optimizer
+    # Users optimize concurrently; results are reported in USER_IDS order
+    with ThreadPoolExecutor(max_workers=len(USER_IDS)) as executor:
+        results = list(executor.map(_optimize_one, user_optimizers.values()))
+    
+    for user_id, (allocation, expected_utility) in zip(USER_IDS, results):
         allocations_step1[user_id] = allocation
         print(f"{user_id}: {format_allocation_vector(allocation)} → utility = {expected_utility:.4f}")
     
@@ -101,10 +108,12 @@ def test_complete_flow():
     
     allocations_step2 = {}
     
-    for i, user_id in enumerate(USER_IDS):
-        print(f"\n--- Re-optimizing {user_id} with updated times ---")
-        optimizer = user_optimizers[user_id]
-        allocation, expected_utility = optimizer.optimize_step1(custom_execution_times=updated_times[i])
+    with ThreadPoolExecutor(max_workers=len(USER_IDS)) as executor:
+        results = list(executor.map(_optimize_one,
+                                    (user_optimizers[user_id] for user_id in USER_IDS),
+                                    updated_times))
+    
+    for user_id, (allocation, expected_utility) in zip(USER_IDS, results):
         allocations_step2[user_id] = allocation
         print(f"{user_id}: {format_allocation_vector(allocation)} → utility = {expected_utility:.4f}")
     
@@ -202,5 +211,6 @@ def test_complete_flow():
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s', stream=sys.stdout)
     test_complete_flow()
 
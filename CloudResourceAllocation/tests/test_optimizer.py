@@ -0,0 +1,187 @@
+"""
+Tests for the user optimizer scan
+Compares the optimizer against a brute-force scan with check_constraints
+and calculate_utility
+"""
+
+import sys
+import os
+import random
+from itertools import combinations
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from user import optimizer
+from user.optimizer import UserOptimizer
+from utils.calculations import (
+    generate_allocation_masks,
+    generate_valid_allocations,
+    batch_time_and_expense,
+    check_constraints,
+    calculate_utility
+)
+from utils.config import (
+    NUM_SUBTASKS,
+    NUM_RESOURCES,
+    RESOURCE_PRICES,
+    TASK_CONSTRAINTS,
+    WEIGHTS_TIME,
+    WEIGHTS_EXPENSE,
+    USER_IDS,
+    get_execution_times
+)
+
+
+requires_numba = pytest.mark.skipif(not optimizer.NUMBA_AVAILABLE,
+                                    reason="Numba is not installed")
+
+
+def brute_force(num_subtasks, num_resources, exec_times, prices,
+                weight_time, weight_expense, deadline, budget):
+    """Index and utility of the first best feasible allocation, or (-1, 0)"""
+    best_idx = -1
+    best_utility = 0
+    for i, allocation in enumerate(generate_valid_allocations(num_subtasks, num_resources).tolist()):
+        if not check_constraints(allocation, exec_times, prices, deadline, budget):
+            continue
+        utility = calculate_utility(allocation, exec_times, prices, weight_time, weight_expense)
+        if utility > best_utility:
+            best_idx = i
+            best_utility = utility
+    return best_idx, best_utility
+
+
+def random_cases(count, seed, min_resources=1, max_resources=10):
+    """Random scan inputs, with repeated times and prices to force ties"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        m = rng.randint(min_resources, max_resources)
+        k = rng.randint(1, m)
+        exec_times = [rng.choice([rng.uniform(0.5, 10.0), 2.0, 3.0]) for _ in range(m)]
+        prices = [rng.choice([rng.uniform(0.5, 3.0), 1.0, 1.2]) for _ in range(m)]
+        yield (k, m, exec_times, prices, rng.random(), rng.random(),
+               rng.choice([rng.uniform(1.0, 10.0), 3.0]), rng.choice([rng.uniform(1.0, 40.0), 30.0]))
+
+
+def expected_allocation(user_id, exec_times):
+    """Brute-force optimum of a configured user"""
+    best_idx, best_utility = brute_force(
+        NUM_SUBTASKS[user_id], NUM_RESOURCES, exec_times, RESOURCE_PRICES,
+        WEIGHTS_TIME[user_id], WEIGHTS_EXPENSE[user_id],
+        TASK_CONSTRAINTS[user_id]['deadline'], TASK_CONSTRAINTS[user_id]['budget'])
+    allocations = generate_valid_allocations(NUM_SUBTASKS[user_id], NUM_RESOURCES)
+    return allocations[best_idx].tolist(), best_utility
+
+
+@pytest.mark.parametrize('user_id', USER_IDS)
+def test_optimize_step1_matches_brute_force(user_id):
+    """Step 1 and Step 2 (custom times) optima match the brute force"""
+    opt = UserOptimizer(user_id)
+
+    base_times = get_execution_times(user_id)
+    assert opt.optimize_step1() == expected_allocation(user_id, base_times)
+
+    step2_times = [t + 1.5 for t in base_times]
+    assert opt.optimize_step1(step2_times) == expected_allocation(user_id, step2_times)
+
+
+def test_generate_valid_allocations_order():
+    """Rows follow itertools.combinations, with one 1 per chosen resource"""
+    for m in range(1, 11):
+        for k in range(m + 1):
+            expected = []
+            for resources in combinations(range(m), k):
+                allocation = [0] * m
+                for j in resources:
+                    allocation[j] = 1
+                expected.append(allocation)
+            assert generate_valid_allocations(k, m).tolist() == expected
+            assert generate_allocation_masks(k, m).tolist() == [
+                int(''.join(map(str, allocation)) or '0', 2) for allocation in expected]
+
+
+def test_batch_functions_match_per_vector():
+    """Batch time, expense and constraints match the per-vector functions"""
+    for k, m, exec_times, prices, wt, we, deadline, budget in random_cases(200, seed=3):
+        allocations = generate_valid_allocations(k, m)
+        max_time, total_expense = batch_time_and_expense(allocations, exec_times, prices)
+        feasible = (max_time <= deadline) & (total_expense <= budget)
+
+        for i, allocation in enumerate(allocations.tolist()):
+            assert feasible[i] == check_constraints(allocation, exec_times, prices, deadline, budget)
+            denominator = wt * max_time[i] + we * total_expense[i]
+            utility = 1.0 / denominator if denominator != 0 else 0
+            assert utility == calculate_utility(allocation, exec_times, prices, wt, we)
+
+
+def test_numpy_scan_matches_brute_force():
+    """NumPy fallback scan matches the brute force"""
+    for k, m, exec_times, prices, wt, we, deadline, budget in random_cases(500, seed=4):
+        best_idx, best_utility, _, evaluated_count = optimizer._scan_allocations_numpy(
+            optimizer._allocations_array(k, m), None, None, np.asarray(exec_times),
+            np.asarray(prices), wt, we, deadline, budget)
+
+        assert evaluated_count == len(optimizer._allocations_array(k, m))
+        assert (best_idx, best_utility) == brute_force(
+            k, m, exec_times, prices, wt, we, deadline, budget)
+
+
+@requires_numba
+def test_numba_scan_matches_brute_force():
+    """Compiled scan on the shared read-only tables matches the brute force"""
+    for k, m, exec_times, prices, wt, we, deadline, budget in random_cases(500, seed=1):
+        alloc_array = optimizer._allocations_array(k, m)
+        prices = np.asarray(prices)
+        price_sums = alloc_array @ prices
+        order = np.argsort(price_sums, kind='stable').astype(np.int64)
+        for array in (prices, price_sums, order):
+            array.setflags(write=False)
+
+        best_idx, best_utility, _, _ = optimizer._scan_allocations(
+            alloc_array, order, price_sums, np.asarray(exec_times), prices,
+            wt, we, deadline, budget)
+
+        assert (best_idx, best_utility) == brute_force(
+            k, m, exec_times, prices, wt, we, deadline, budget)
+
+
+@requires_numba
+def test_parallel_scan_matches_brute_force():
+    """Parallel scan on a read-only table above the threshold matches the brute force"""
+    # C(15, 7) = 6435 allocations, above PARALLEL_SCAN_MIN_ROWS
+    alloc_array = optimizer._allocations_array(7, 15)
+    assert len(alloc_array) >= optimizer.PARALLEL_SCAN_MIN_ROWS
+
+    for _, _, exec_times, prices, wt, we, deadline, budget in random_cases(
+            20, seed=2, min_resources=15, max_resources=15):
+        prices = np.asarray(prices)
+        prices.setflags(write=False)
+
+        best_idx, best_utility, _, evaluated_count = optimizer._scan_allocations_parallel(
+            alloc_array, np.asarray(exec_times), prices, wt, we, deadline, budget)
+
+        assert evaluated_count == len(alloc_array)
+        assert (best_idx, best_utility) == brute_force(
+            7, 15, exec_times, prices, wt, we, deadline, budget)
+
+
+@pytest.mark.parametrize('exec_times', [
+    [1.0, 2.0],
+    [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+    [[1.0, 2.0, 3.0, 4.0, 5.0]],
+    ['a', 'b', 'c', 'd', 'e'],
+    [1.0, 2.0, float('nan'), 4.0, 5.0],
+    5.0,
+])
+def test_optimize_step1_rejects_invalid_execution_times(exec_times):
+    """Custom times of the wrong length or type raise instead of being scanned"""
+    with pytest.raises(ValueError):
+        UserOptimizer('S3').optimize_step1(exec_times)
+
+
+def test_optimize_step1_rejects_negative_execution_times():
+    """Negative times would break the early exits of the scan, so they raise"""
+    with pytest.raises(ValueError, match='negative'):
+        UserOptimizer('S1').optimize_step1([25.0, -10.0, 100.0, 100.0, 100.0])
@@ -5,6 +5,7 @@ Tests the complete flow from user optimization to provider calculation
 
 import sys
 import os
+import logging
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from user.optimizer import UserOptimizer
@@ -103,5 +104,6 @@ def test_step1_complete():
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s', stream=sys.stdout)
     test_step1_complete()
 
@@ -0,0 +1,254 @@
+"""
+Tests for the submission handler and get-and-send Lambdas
+Runs the handlers against an in-memory DynamoDB table (moto), with the
+Lambda 2 invoke client and the Resource Manager call stubbed
+"""
+
+import sys
+import os
+import json
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda'))
+
+import boto3
+import pytest
+from moto import mock_aws
+
+import get_and_send
+import submission_handler as handler
+
+
+REGION = 'us-east-1'
+
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    """Fresh table with the step-status-index GSI, wired into the handler"""
+    for name, value in (('AWS_ACCESS_KEY_ID', 'testing'),
+                        ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_DEFAULT_REGION', REGION)):
+        monkeypatch.setenv(name, value)
+
+    with mock_aws():
+        client = boto3.client('dynamodb', region_name=REGION)
+        client.create_table(
+            TableName=handler.DYNAMODB_TABLE,
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'timestamp', 'AttributeType': 'S'},
+                                  {'AttributeName': 'step', 'AttributeType': 'N'}],
+            GlobalSecondaryIndexes=[{
+                'IndexName': 'step-status-index',
+                'KeySchema': [{'AttributeName': 'step', 'KeyType': 'HASH'},
+                              {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}],
+                'Projection': {'ProjectionType': 'ALL'}
+            }],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        resource = boto3.resource('dynamodb', region_name=REGION)
+
+        monkeypatch.setattr(handler, 'dynamodb_client', client)
+        monkeypatch.setattr(handler, 'table', resource.Table(handler.DYNAMODB_TABLE))
+        monkeypatch.setattr(get_and_send, 'dynamodb_client', client)
+        monkeypatch.setattr(get_and_send, 'RESOURCE_MANAGER_URL', 'http://resource-manager')
+        monkeypatch.setattr(get_and_send, 'send_to_resource_manager',
+                            mock.MagicMock(return_value={'status': 'ok'}))
+        monkeypatch.setattr(handler, 'lambda_client', mock.MagicMock())
+        handler.lambda_client.invoke.return_value = {'StatusCode': 202}
+        yield client
+
+
+def make_record(user_id, timestamp, step=1, message_id=None):
+    """SQS record carrying one user's submission"""
+    return {
+        'messageId': message_id or f'{user_id}-{timestamp}',
+        'body': json.dumps({
+            'user_id': user_id,
+            'allocation_vector': [0, 0, 0, 1, 1],
+            'expected_utility': 0.25,
+            'timestamp': timestamp,
+            'step': step
+        })
+    }
+
+
+def round_records(suffix='a', step=1):
+    """One submission per configured user"""
+    return [make_record(user_id, f'2026-01-01T00:00:0{i}{suffix}', step)
+            for i, user_id in enumerate(handler.USER_IDS)]
+
+
+def invoked_payloads():
+    """Payloads of every Lambda 2 invocation so far"""
+    return [json.loads(call.kwargs['Payload'])
+            for call in handler.lambda_client.invoke.call_args_list]
+
+
+def trigger_markers(client):
+    """Sort keys of the stored trigger markers"""
+    response = client.query(
+        TableName=handler.DYNAMODB_TABLE,
+        KeyConditionExpression='user_id = :u',
+        ExpressionAttributeValues={':u': {'S': handler.TRIGGER_MARKER_USER_ID}})
+    return [item['timestamp']['S'] for item in response['Items']]
+
+
+def counter_state(client, step=1):
+    """Users and timestamps currently recorded on a step counter"""
+    item = client.get_item(TableName=handler.DYNAMODB_TABLE,
+                           Key=handler.get_counter_key(step),
+                           ConsistentRead=True).get('Item', {})
+    users = set(item.get('submitted_users', {}).get('SS', []))
+    timestamps = {key[3:]: value['S'] for key, value in item.items() if key.startswith('ts_')}
+    return users, timestamps
+
+
+def run_lambda_2():
+    """Run get_and_send with the payload of the latest Lambda 2 invocation"""
+    return get_and_send.lambda_handler(invoked_payloads()[-1], None)
+
+
+def test_full_round_triggers_once_with_timestamps(dynamodb):
+    """The last submission of a round triggers Lambda 2 with the round's timestamps"""
+    records = round_records()
+
+    result = handler.lambda_handler({'Records': records[:2]}, None)
+    assert result['result']['triggered_steps'] == []
+
+    result = handler.lambda_handler({'Records': records[2:]}, None)
+    assert result['result']['triggered_steps'] == [1]
+    assert invoked_payloads() == [{
+        'step': 1,
+        'trigger_source': 'submission_handler',
+        'timestamps': {user_id: json.loads(record['body'])['timestamp']
+                       for user_id, record in zip(handler.USER_IDS, records)}
+    }]
+
+
+def test_unknown_user_does_not_complete_round(dynamodb):
+    """A submission from an id outside USER_IDS is dropped"""
+    records = round_records()[:2] + [make_record('S4', '2026-01-01T00:00:09a')]
+
+    result = handler.lambda_handler({'Records': records}, None)
+
+    assert result['result']['processed'] == 2
+    assert result['result']['triggered_steps'] == []
+    assert not handler.lambda_client.invoke.called
+
+
+def test_duplicate_message_ids_in_one_batch(dynamodb):
+    """A record delivered twice in the same batch is stored and counted once"""
+    records = round_records()
+    batch = records + [dict(records[2])]
+
+    result = handler.lambda_handler({'Records': batch}, None)
+
+    assert result['result']['processed'] == len(handler.USER_IDS)
+    assert result['result']['triggered_steps'] == [1]
+    assert handler.lambda_client.invoke.call_count == 1
+
+
+def test_replayed_record_does_not_trigger_again(dynamodb):
+    """Redelivering a batch that already triggered is a no-op"""
+    records = round_records()
+    handler.lambda_handler({'Records': records}, None)
+
+    result = handler.lambda_handler({'Records': records}, None)
+
+    assert result['result']['processed'] == 0
+    assert result['result']['triggered_steps'] == []
+    assert handler.lambda_client.invoke.call_count == 1
+
+
+def test_redelivery_after_failed_trigger(dynamodb):
+    """A failed invoke releases the marker, so the redelivered batch triggers"""
+    records = round_records()
+    handler.lambda_client.invoke.side_effect = RuntimeError('invoke failed')
+
+    with pytest.raises(RuntimeError):
+        handler.lambda_handler({'Records': records}, None)
+    assert trigger_markers(dynamodb) == []
+
+    handler.lambda_client.invoke.side_effect = None
+    result = handler.lambda_handler({'Records': records}, None)
+
+    assert result['result']['triggered_steps'] == [1]
+    assert len(trigger_markers(dynamodb)) == 1
+
+
+def test_failed_release_is_raised(dynamodb, monkeypatch):
+    """A marker that cannot be released fails the batch instead of being ignored"""
+    handler.lambda_client.invoke.side_effect = RuntimeError('invoke failed')
+    monkeypatch.setattr(dynamodb, 'delete_item',
+                        mock.MagicMock(side_effect=RuntimeError('delete failed')))
+
+    with pytest.raises(RuntimeError, match='delete failed'):
+        handler.lambda_handler({'Records': round_records()}, None)
+
+
+def test_round_is_processed_and_counter_reset(dynamodb):
+    """Lambda 2 processes the triggered round and clears the counter"""
+    handler.lambda_handler({'Records': round_records()}, None)
+
+    result = run_lambda_2()
+
+    assert result['statusCode'] == 200
+    assert list(result['result']['allocations']) == handler.USER_IDS
+    assert counter_state(dynamodb) == (set(), {})
+
+
+def test_processed_round_is_not_reprocessed(dynamodb):
+    """Running Lambda 2 again for a processed round finds nothing pending"""
+    handler.lambda_handler({'Records': round_records()}, None)
+    run_lambda_2()
+
+    result = run_lambda_2()
+
+    assert result['statusCode'] == 400
+    assert get_and_send.send_to_resource_manager.call_count == 1
+
+
+def test_late_submission_during_processing(dynamodb):
+    """A user submitting while Lambda 2 runs stays counted for the next round"""
+    handler.lambda_handler({'Records': round_records('a')}, None)
+    late_round = round_records('b')
+
+    def submit_late(allocations, step):
+        handler.lambda_handler({'Records': late_round[:1]}, None)
+        return {'status': 'ok'}
+    get_and_send.send_to_resource_manager.side_effect = submit_late
+
+    assert run_lambda_2()['statusCode'] == 200
+    first_user = handler.USER_IDS[0]
+    assert counter_state(dynamodb) == (
+        {first_user}, {first_user: json.loads(late_round[0]['body'])['timestamp']})
+
+    # One more submission is not a full round
+    result = handler.lambda_handler({'Records': late_round[1:2]}, None)
+    assert result['result']['triggered_steps'] == []
+
+    result = handler.lambda_handler({'Records': late_round[2:]}, None)
+    assert result['result']['triggered_steps'] == [1]
+    assert invoked_payloads()[-1]['timestamps'] == {
+        user_id: json.loads(record['body'])['timestamp']
+        for user_id, record in zip(handler.USER_IDS, late_round)}
+
+
+def test_failed_reset_keeps_other_users_cleared(dynamodb, monkeypatch):
+    """A reset error for one user does not keep the others counted"""
+    handler.lambda_handler({'Records': round_records()}, None)
+    failing_user = handler.USER_IDS[1]
+    update_item = dynamodb.update_item
+
+    def failing_update(**kwargs):
+        if kwargs['ExpressionAttributeNames'] == {'#user_ts': f'ts_{failing_user}'}:
+            raise RuntimeError('update failed')
+        return update_item(**kwargs)
+    monkeypatch.setattr(dynamodb, 'update_item', failing_update)
+
+    assert run_lambda_2()['statusCode'] == 200
+    users, timestamps = counter_state(dynamodb)
+    assert users == {failing_user}
+    assert set(timestamps) == {failing_user}
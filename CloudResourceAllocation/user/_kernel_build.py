@@ -0,0 +1,25 @@
+"""
+Ahead-of-time build of the optimizer scan kernel
+Compiles _scan_allocations_py into the extension module user/optimizer_kernel
+so the user app never pays the Numba JIT cost on its first request
+
+Usage: python3 user/_kernel_build.py
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from numba.pycc import CC
+from user.optimizer import SCAN_SIGNATURE, _scan_allocations_py
+
+
+cc = CC('optimizer_kernel')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+cc.export('scan_allocations', SCAN_SIGNATURE)(_scan_allocations_py)
+
+
+if __name__ == '__main__':
+    cc.compile()
+    print(f"Built {cc.name} in {cc.output_dir}")
@@ -5,12 +5,16 @@ Implements brute-force optimization with constraint checking
 
 import sys
 import os
+import logging
+import numpy as np
+from functools import lru_cache
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.calculations import (
     generate_valid_allocations,
+    batch_time_and_expense,
+    best_by_denominator,
     calculate_utility,
-    check_constraints,
     calculate_actual_utility,
     format_allocation_vector
 )
@@ -18,12 +22,269 @@ from utils.config import (
     NUM_SUBTASKS,
     NUM_RESOURCES,
     RESOURCE_PRICES,
+    RESOURCE_PRICES_ARRAY,
     TASK_CONSTRAINTS,
     WEIGHTS_TIME,
     WEIGHTS_EXPENSE,
-    get_execution_times
+    USER_IDS,
+    get_execution_times,
+    get_execution_times_array
 )
-from typing import List, Tuple, Dict
+from typing import List, Optional, Tuple, Dict
+
+log = logging.getLogger(__name__)
+
+try:
+    from numba import njit, prange, types
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+
+# Kernel signature: C-contiguous int8 table and float64 vectors, so the
+# compiled loops need no stride checks. Times stay float64: float32
+# would shift utilities and flip deadline/budget checks at the boundary.
+# The arrays are declared read-only since the allocation table, scan
+# order and prices are shared read-only arrays; a read-only argument
+# type also accepts writable arrays (the execution times).
+# (alloc_matrix, order, price_sums, exec_times, prices, wt, we, deadline, budget)
+#   -> (best_index, best_utility, feasible_count, evaluated_count)
+if NUMBA_AVAILABLE:
+    _SCAN_RESULT = types.Tuple((types.int64, types.float64, types.int64, types.int64))
+    _ALLOC_TABLE = types.Array(types.int8, 2, 'C', readonly=True)
+    _INDEX_VECTOR = types.Array(types.int64, 1, 'C', readonly=True)
+    _FLOAT_VECTOR = types.Array(types.float64, 1, 'C', readonly=True)
+    
+    SCAN_SIGNATURE = _SCAN_RESULT(_ALLOC_TABLE, _INDEX_VECTOR, _FLOAT_VECTOR,
+                                  _FLOAT_VECTOR, _FLOAT_VECTOR, types.float64,
+                                  types.float64, types.float64, types.float64)
+else:
+    SCAN_SIGNATURE = None
+
+# Below this many allocations thread start-up outweighs the parallel scan
+PARALLEL_SCAN_MIN_ROWS = 4096
+
+# Static resource prices shared by every optimizer (never copied)
+_PRICES = RESOURCE_PRICES_ARRAY
+
+
+def _evaluate_row_py(alloc_matrix, i, exec_times, prices,
+                     weight_time, weight_expense, deadline, budget):
+    """
+    Utility of allocation row i, or -1.0 if it violates a constraint
+    
+    check_constraints and calculate_utility fused into one pass: the max
+    time and total expense are accumulated once. Times
+    and expenses are non-negative, so the row is abandoned as soon as one
+    resource exceeds the deadline or the running expense exceeds the
+    budget.
+    """
+    max_time = 0.0
+    total_expense = 0.0
+    for j in range(alloc_matrix.shape[1]):
+        if alloc_matrix[i, j] == 1:
+            t = exec_times[j]
+            if t > deadline:
+                return -1.0
+            if t > max_time:
+                max_time = t
+            total_expense += t * prices[j]
+            if total_expense > budget:
+                return -1.0
+    
+    denominator = weight_time * max_time + weight_expense * total_expense
+    return 0.0 if denominator == 0 else 1.0 / denominator
+
+
+# Inlined into the compiled kernels below when Numba is installed
+if NUMBA_AVAILABLE:
+    _evaluate_row = njit(inline='always', nogil=True)(_evaluate_row_py)
+else:
+    _evaluate_row = _evaluate_row_py
+
+
+def _scan_allocations_py(alloc_matrix, order, price_sums, exec_times, prices,
+                         weight_time, weight_expense, deadline, budget):
+    """
+    Brute-force scan over all allocations in a single pass
+    
+    Each row is evaluated in one fused pass (_evaluate_row) and the best
+    utility is tracked (first maximum by row index wins).
+    
+    Rows are visited by ascending price sum. Any allocation of k subtasks
+    takes at least the k-th smallest time and costs at least
+    min(t) * sum(p), so once the best utility beats that bound for the
+    current row no later row can improve on it and the scan stops.
+    
+    Args:
+        alloc_matrix: int8 array (N x m) of allocation vectors
+        order: int64 array (N,) of row indices by ascending price sum
+        price_sums: float64 array (N,) of the price sum of each row
+        exec_times: float64 array (m,) of base execution times
+        prices: float64 array (m,) of resource prices
+        weight_time: Weight for execution time (wt)
+        weight_expense: Weight for expense (we)
+        deadline: Maximum allowed time
+        budget: Maximum allowed budget
+    
+    Returns:
+        Tuple of (best_index, best_utility, feasible_count, evaluated_count);
+        best_index is -1 if no allocation is feasible
+    """
+    n_rows = alloc_matrix.shape[0]
+    n_resources = alloc_matrix.shape[1]
+    
+    # Lower bounds on max time and on time per unit price for any row.
+    # They assume non-negative times (enforced by UserOptimizer): with a
+    # negative time the bound can exceed a row's true denominator, and
+    # the break below could skip the optimum
+    num_subtasks = 0
+    for j in range(n_resources):
+        num_subtasks += alloc_matrix[0, j]
+    min_max_time = np.sort(exec_times)[num_subtasks - 1]
+    min_time = exec_times.min()
+    
+    best_idx = -1
+    best_utility = 0.0
+    feasible_count = 0
+    evaluated_count = 0
+    
+    for r in range(n_rows):
+        i = order[r]
+        
+        if best_idx >= 0:
+            bound = weight_time * min_max_time + weight_expense * min_time * price_sums[i]
+            # Small slack so rounding in the bound never prunes a tie
+            if bound > 0 and best_utility * bound > 1.0 + 1e-12:
+                break
+        evaluated_count += 1
+        
+        utility = _evaluate_row(alloc_matrix, i, exec_times, prices,
+                                weight_time, weight_expense, deadline, budget)
+        if utility < 0:
+            continue
+        feasible_count += 1
+        
+        if utility > best_utility or (utility == best_utility and 0 <= i < best_idx):
+            best_utility = utility
+            best_idx = i
+    
+    return best_idx, best_utility, feasible_count, evaluated_count
+
+
+def _scan_allocations_parallel_py(alloc_matrix, exec_times, prices,
+                                  weight_time, weight_expense, deadline, budget):
+    """
+    Exhaustive scan with rows evaluated in parallel (numba prange)
+    
+    For large allocation tables: every row is evaluated independently
+    across threads, then a short sequential pass picks the first maximum.
+    Bound pruning is not applied since it needs the sequential order.
+    
+    Returns:
+        Same tuple as _scan_allocations_py; every row is evaluated
+    """
+    n_rows = alloc_matrix.shape[0]
+    utilities = np.empty(n_rows, dtype=np.float64)
+    
+    for i in prange(n_rows):
+        utilities[i] = _evaluate_row(alloc_matrix, i, exec_times, prices,
+                                     weight_time, weight_expense, deadline, budget)
+    
+    best_idx = -1
+    best_utility = 0.0
+    feasible_count = 0
+    for i in range(n_rows):
+        if utilities[i] < 0:
+            continue
+        feasible_count += 1
+        if utilities[i] > best_utility:
+            best_utility = utilities[i]
+            best_idx = i
+    
+    return best_idx, best_utility, feasible_count, n_rows
+
+
+@lru_cache(maxsize=8)
+def _allocations_array(num_subtasks: int, num_resources: int) -> np.ndarray:
+    """
+    All valid allocations as a read-only int8 array (N x num_resources)
+    
+    The enumeration only depends on (num_subtasks, num_resources), so it
+    is built once per process and shared by every user and step. The
+    uint8 rows of generate_valid_allocations are reinterpreted as int8
+    in place (the values are 0/1), so their order is the same.
+    """
+    allocations = generate_valid_allocations(num_subtasks, num_resources).view(np.int8)
+    allocations.setflags(write=False)
+    return allocations
+
+
+@lru_cache(maxsize=8)
+def _allocations_by_price(num_subtasks: int,
+                          num_resources: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scan order of the allocation table for bound pruning
+    
+    Returns:
+        Tuple of (order, price_sums): row indices sorted by ascending
+        price sum (stable), and the price sum of each row
+    """
+    price_sums = _allocations_array(num_subtasks, num_resources) @ _PRICES
+    order = np.argsort(price_sums, kind='stable').astype(np.int64)
+    price_sums.setflags(write=False)
+    order.setflags(write=False)
+    return order, price_sums
+
+
+# Allocation table of each configured user, built at import: the shapes
+# are fixed by the config, so optimizers only look them up by user_id
+ALLOCATIONS = {
+    user_id: _allocations_array(NUM_SUBTASKS[user_id], NUM_RESOURCES)
+    for user_id in USER_IDS
+}
+
+
+def _scan_allocations_numpy(alloc_matrix, order, price_sums, exec_times, prices,
+                            weight_time, weight_expense, deadline, budget):
+    """
+    Vectorized equivalent of _scan_allocations_py for when Numba is missing
+    
+    Evaluates every allocation at once with broadcasting and picks the
+    best feasible one by the smallest utility denominator (first best
+    wins, as in the loop).
+    Pruning does not pay off here, so order and price_sums are unused.
+    """
+    max_time, total_expense = batch_time_and_expense(alloc_matrix, exec_times, prices)
+    
+    feasible = (max_time <= deadline) & (total_expense <= budget)
+    feasible_count = int(np.count_nonzero(feasible))
+    
+    # Smallest denominator instead of the largest utility: one division
+    denominator = weight_time * max_time + weight_expense * total_expense
+    best_idx, best_utility = best_by_denominator(denominator, feasible)
+    return best_idx, best_utility, feasible_count, len(alloc_matrix)
+
+
+# Prefer the ahead-of-time build (user/_kernel_build.py), then the Numba
+# JIT (cached on disk), otherwise evaluate with NumPy broadcasting
+try:
+    from user.optimizer_kernel import scan_allocations as _scan_allocations
+except ImportError:
+    if NUMBA_AVAILABLE:
+        _scan_allocations = njit(SCAN_SIGNATURE, cache=True, nogil=True)(_scan_allocations_py)
+    else:
+        _scan_allocations = _scan_allocations_numpy
+
+# No signature, so it is compiled on its first call instead of at import:
+# none of the configured allocation tables reaches PARALLEL_SCAN_MIN_ROWS,
+# and compiling the parallel kernel eagerly costs seconds per process
+if NUMBA_AVAILABLE:
+    _scan_allocations_parallel = njit(parallel=True, cache=True,
+                                      nogil=True)(_scan_allocations_parallel_py)
+else:
+    _scan_allocations_parallel = None
 
 
 class UserOptimizer:
@@ -43,102 +304,207 @@ class UserOptimizer:
         self.num_subtasks = NUM_SUBTASKS[user_id]
         self.num_resources = NUM_RESOURCES
         self.execution_times = get_execution_times(user_id)
+        self._execution_times = get_execution_times_array(user_id)
         self.resource_prices = RESOURCE_PRICES
+        self._prices = _PRICES
         self.weight_time = WEIGHTS_TIME[user_id]
         self.weight_expense = WEIGHTS_EXPENSE[user_id]
         self.deadline = TASK_CONSTRAINTS[user_id]['deadline']
         self.budget = TASK_CONSTRAINTS[user_id]['budget']
         
+        # Precomputed allocation table and its price-sorted scan order
+        self._alloc_array = ALLOCATIONS[user_id]
+        self._scan_order = _allocations_by_price(self.num_subtasks, self.num_resources)
+        
         self.optimal_allocation = None
         self.optimal_utility = 0
         
-        print(f"\n=== Initialized Optimizer for {user_id} ===")
-        print(f"Subtasks: {self.num_subtasks}")
-        print(f"Weights: wt={self.weight_time:.2f}, we={self.weight_expense:.2f}")
-        print(f"Constraints: T≤{self.deadline}s, M≤{self.budget}€")
+        # Scan results keyed by the execution times, so repeated requests
+        # with the same times skip the scan entirely
+        self._cached_scan = lru_cache(maxsize=32)(self._scan)
+        
+        log.info("=== Initialized Optimizer for %s ===", user_id)
+        log.info("Subtasks: %d", self.num_subtasks)
+        log.info("Weights: wt=%.2f, we=%.2f", self.weight_time, self.weight_expense)
+        log.info("Constraints: T≤%ss, M≤%s€", self.deadline, self.budget)
     
     def optimize_step1(self, custom_execution_times: List[float] = None) -> Tuple[List[int], float]:
         """
         Perform Step 1 optimization (independent, no multiplexing)
         
+        Stores the result as optimal_allocation / optimal_utility; see
+        find_optimal_allocation for a call that leaves the optimizer
+        untouched.
+        
+        Args:
+            custom_execution_times: Optional custom execution times (for Step 2)
+        
+        Returns:
+            Tuple of (optimal_allocation_vector, expected_utility)
+        
+        Raises:
+            ValueError: If the execution times are not one finite,
+                        non-negative number per resource
+        """
+        best_allocation, best_utility = self.find_optimal_allocation(custom_execution_times)
+        self.optimal_allocation = best_allocation
+        self.optimal_utility = best_utility
+        return best_allocation, best_utility
+    
+    def find_optimal_allocation(self,
+                                custom_execution_times: List[float] = None) -> Tuple[List[int], float]:
+        """
+        Find the optimal allocation without storing it on the optimizer
+        
+        Only reads the optimizer's fixed configuration and its scan cache,
+        so concurrent calls from several threads need no lock.
+        
         Args:
             custom_execution_times: Optional custom execution times (for Step 2)
         
         Returns:
             Tuple of (optimal_allocation_vector, expected_utility)
+        
+        Raises:
+            ValueError: If the execution times are not one finite,
+                        non-negative number per resource
         """
-        exec_times = custom_execution_times if custom_execution_times else self.execution_times
+        if custom_execution_times is None or np.size(custom_execution_times) == 0:
+            exec_times = self._execution_times
+        else:
+            exec_times = self._validate_execution_times(custom_execution_times)
         
-        print(f"\n--- Optimizing {self.user_id} (Step 1) ---")
-        print(f"Execution times: {exec_times}")
+        log.debug("--- Optimizing %s (Step 1) ---", self.user_id)
+        log.debug("Execution times: %s", exec_times)
         
-        # Generate all valid allocations
-        all_allocations = generate_valid_allocations(self.num_subtasks, self.num_resources)
-        print(f"Evaluating {len(all_allocations)} possible allocations...")
+        # All valid allocations (enumerated once at import)
+        alloc_array = self._alloc_array
+        log.debug("Evaluating %d possible allocations...", len(alloc_array))
         
         best_allocation = None
         best_utility = 0
         feasible_count = 0
         
-        for allocation in all_allocations:
-            # Check constraints
-            if not check_constraints(allocation, exec_times, self.resource_prices,
-                                    self.deadline, self.budget):
-                continue
-            
-            feasible_count += 1
-            
-            # Calculate utility
-            utility = calculate_utility(allocation, exec_times, self.resource_prices,
-                                       self.weight_time, self.weight_expense)
-            
-            # Update best if this is better
-            if utility > best_utility:
-                best_utility = utility
-                best_allocation = allocation
+        # Single scan over the allocation table (Numba or NumPy), cached
+        best_idx, utility, feasible_count, evaluated_count = self._cached_scan(
+            tuple(exec_times.tolist()))
+        if best_idx >= 0:
+            best_allocation = alloc_array[best_idx].tolist()
+            best_utility = utility
         
         if best_allocation is None:
-            print(f"WARNING: No feasible allocation found for {self.user_id}!")
+            log.warning("No feasible allocation found for %s!", self.user_id)
             # Return a default allocation (first valid one)
-            best_allocation = all_allocations[0]
+            best_allocation = alloc_array[0].tolist()
             best_utility = calculate_utility(best_allocation, exec_times, self.resource_prices,
                                             self.weight_time, self.weight_expense)
         
-        self.optimal_allocation = best_allocation
-        self.optimal_utility = best_utility
-        
-        print(f"Feasible allocations: {feasible_count}/{len(all_allocations)}")
-        print(f"Optimal allocation: {format_allocation_vector(best_allocation)}")
-        print(f"Expected utility: {best_utility:.4f}")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Feasible allocations: %d/%d (%d evaluated)",
+                      feasible_count, len(alloc_array), evaluated_count)
+            log.debug("Optimal allocation: %s", format_allocation_vector(best_allocation))
+            log.debug("Expected utility: %.4f", best_utility)
         
         return best_allocation, best_utility
     
+    def _validate_execution_times(self, exec_times) -> np.ndarray:
+        """
+        Check custom execution times before they reach the scan kernel
+        
+        The compiled scan does not bounds-check, so a short vector would
+        be read past its end instead of raising, and its early exits
+        assume non-negative times.
+        
+        Returns:
+            The execution times as a float64 array
+        """
+        times = np.asarray(exec_times)
+        if times.dtype.kind not in 'iuf':
+            raise ValueError(f"Execution times must be numbers, got {times.dtype} values")
+        if times.shape != (self.num_resources,):
+            raise ValueError(f"Expected {self.num_resources} execution times, "
+                             f"got shape {times.shape}")
+        if not np.isfinite(times).all():
+            raise ValueError("Execution times must be finite")
+        # The scans abandon rows and prune by bounds that hold only for
+        # non-negative times
+        if (times < 0).any():
+            raise ValueError("Execution times must not be negative")
+        return times.astype(np.float64)
+    
+    def _scan(self, exec_times: Tuple[float, ...]) -> Tuple[int, float, int, int]:
+        """
+        Run the allocation scan for the given execution times
+        
+        Args:
+            exec_times: Execution time per resource (hashable, used as cache key)
+        
+        Returns:
+            Tuple of (best_index, best_utility, feasible_count, evaluated_count)
+        """
+        alloc_array = self._alloc_array
+        
+        if _scan_allocations_parallel is not None and len(alloc_array) >= PARALLEL_SCAN_MIN_ROWS:
+            return _scan_allocations_parallel(
+                alloc_array,
+                np.asarray(exec_times, dtype=np.float64),
+                self._prices,
+                self.weight_time, self.weight_expense,
+                float(self.deadline), float(self.budget))
+        
+        order, price_sums = self._scan_order
+        return _scan_allocations(
+            alloc_array,
+            order,
+            price_sums,
+            np.asarray(exec_times, dtype=np.float64),
+            self._prices,
+            self.weight_time, self.weight_expense,
+            float(self.deadline), float(self.budget))
+    
     def calculate_actual_utility_from_matrices(self, 
                                               time_vector: List[float],
-                                              expense_vector: List[float]) -> float:
+                                              expense_vector: List[float],
+                                              allocation_vector: Optional[List[int]] = None,
+                                              expected_utility: Optional[float] = None) -> float:
         """
         Calculate actual utility given time and expense vectors from provider
         
         Args:
-            time_vector: Actual execution times for each resource
-            expense_vector: Actual expenses for each resource
+            time_vector: Actual execution times for each resource (list or ndarray)
+            expense_vector: Actual expenses for each resource (list or ndarray)
+            allocation_vector: Allocation the matrices belong to
+                               (default: optimal_allocation)
+            expected_utility: Expected utility of that allocation, for the
+                              utility loss (default: optimal_utility)
         
         Returns:
             Actual utility value
         """
-        actual_utility = calculate_actual_utility(
-            self.optimal_allocation,
+        if allocation_vector is None:
+            allocation_vector = self.optimal_allocation
+        if expected_utility is None:
+            expected_utility = self.optimal_utility
+        
+        # No copy when the caller already passes float64 arrays
+        time_vector = np.asarray(time_vector, dtype=np.float64)
+        expense_vector = np.asarray(expense_vector, dtype=np.float64)
+        
+        actual_utility = float(calculate_actual_utility(
+            allocation_vector,
             time_vector,
             expense_vector,
             self.weight_time,
             self.weight_expense
-        )
+        ))
         
-        print(f"\n--- Actual Utility for {self.user_id} ---")
-        print(f"Time vector: {[f'{t:.2f}' for t in time_vector]}")
-        print(f"Expense vector: {[f'{e:.2f}' for e in expense_vector]}")
-        print(f"Actual utility: {actual_utility:.4f}")
-        print(f"Utility loss: {self.optimal_utility - actual_utility:.4f}")
+        # Formatting is skipped unless DEBUG is enabled
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("--- Actual Utility for %s ---", self.user_id)
+            log.debug("Time vector: %s", [f'{t:.2f}' for t in time_vector])
+            log.debug("Expense vector: %s", [f'{e:.2f}' for e in expense_vector])
+            log.debug("Actual utility: %.4f", actual_utility)
+            log.debug("Utility loss: %.4f", expected_utility - actual_utility)
         
         return actual_utility
     
@@ -177,6 +543,8 @@ def test_optimizer(user_id: str = 'S1'):
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s', stream=sys.stdout)
+    
     # Test all three users
     for user_id in ['S1', 'S2', 'S3']:
         test_optimizer(user_id)
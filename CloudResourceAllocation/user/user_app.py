@@ -5,32 +5,60 @@ Handles optimization and communication with Cloud Provider
 
 import sys
 import os
+import logging
+import threading
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from flask import Flask, request, jsonify
+from flask import Flask, request
 import boto3
-import json
+import numpy as np
+import orjson
+from dataclasses import dataclass
 from datetime import datetime
+from typing import List, Optional
 from user.optimizer import UserOptimizer
 from utils.config import AWS_CONFIG
+from utils.json_provider import OrjsonProvider, orjson_response
 
 # Get user ID from environment variable or command line
 USER_ID = os.environ.get('USER_ID', 'S1')
 
+# INFO by default; set LOG_LEVEL=DEBUG to log every optimization in detail
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'),
+                    format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+log = logging.getLogger(__name__)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
-# Initialize optimizer
+# Initialize optimizer and run the Step 1 scan once at startup, so the
+# kernel is compiled and its result cached before the first request
 optimizer = UserOptimizer(USER_ID)
+optimizer.find_optimal_allocation()
+
+# SQS client shared across requests (reuses its connection pool);
+# not created at all when no queue is configured
+sqs = (boto3.client('sqs', region_name=AWS_CONFIG['region'])
+       if AWS_CONFIG['sqs_queue_url'] else None)
+
+@dataclass
+class UserState:
+    """Latest optimization and provider results of this user"""
+    allocation_vector: Optional[List[int]] = None
+    expected_utility: Optional[float] = None
+    actual_utility: Optional[float] = None
+    time_vector: Optional[np.ndarray] = None
+    expense_vector: Optional[np.ndarray] = None
+    max_time: Optional[float] = None
+    total_expense: Optional[float] = None
+    step: int = 0
 
-# Store state
-state = {
-    'allocation_vector': None,
-    'expected_utility': None,
-    'actual_utility': None,
-    'time_vector': None,
-    'expense_vector': None,
-    'step': 0
-}
+
+# Store state; handlers run on several threads under gunicorn, so every
+# multi-field read or write holds state_lock to stay consistent. The
+# optimizer itself is not shared state: handlers compute outside the lock
+state = UserState()
+state_lock = threading.Lock()
 
 
 def send_to_sqs(allocation_vector, expected_utility, step):
@@ -44,13 +72,11 @@ def send_to_sqs(allocation_vector, expected_utility, step):
     """
     sqs_url = AWS_CONFIG['sqs_queue_url']
     
-    if not sqs_url:
-        print("WARNING: SQS queue URL not configured. Skipping SQS submission.")
+    if not sqs_url or sqs is None:
+        log.warning("SQS queue URL not configured. Skipping SQS submission.")
         return
     
     try:
-        sqs = boto3.client('sqs', region_name=AWS_CONFIG['region'])
-        
         message = {
             'user_id': USER_ID,
             'allocation_vector': allocation_vector,
@@ -61,24 +87,24 @@ def send_to_sqs(allocation_vector, expected_utility, step):
         
         response = sqs.send_message(
             QueueUrl=sqs_url,
-            MessageBody=json.dumps(message)
+            MessageBody=orjson.dumps(message).decode('utf-8')
         )
         
-        print(f"Sent message to SQS: {response['MessageId']}")
+        log.info("Sent message to SQS: %s", response['MessageId'])
         return response
         
     except Exception as e:
-        print(f"Error sending to SQS: {e}")
+        log.error("Error sending to SQS: %s", e)
         raise
 
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({
+    return orjson_response({
         'status': 'healthy',
         'user_id': USER_ID,
-        'step': state['step']
+        'step': state.step
     })
 
 
@@ -106,24 +132,24 @@ def optimize():
         step = data.get('step', 1)
         custom_times = data.get('custom_execution_times', None)
         
-        print(f"\n=== Optimization Request for {USER_ID} (Step {step}) ===")
+        log.info("=== Optimization Request for %s (Step %s) ===", USER_ID, step)
         
-        # Perform optimization
-        allocation, utility = optimizer.optimize_step1(custom_execution_times=custom_times)
-        
-        # Store state
-        state['allocation_vector'] = allocation
-        state['expected_utility'] = utility
-        state['step'] = step
+        # Optimize outside the lock (the scan releases the GIL, so requests
+        # on other threads run in parallel); only publishing takes the lock
+        allocation, utility = optimizer.find_optimal_allocation(custom_execution_times=custom_times)
+        with state_lock:
+            state.allocation_vector = allocation
+            state.expected_utility = utility
+            state.step = step
         
         # Send to SQS if configured
         try:
             if AWS_CONFIG['sqs_queue_url']:
                 send_to_sqs(allocation, utility, step)
         except Exception as e:
-            print(f"Warning: Could not send to SQS: {e}")
+            log.warning("Could not send to SQS: %s", e)
         
-        return jsonify({
+        return orjson_response({
             'user_id': USER_ID,
             'allocation_vector': allocation,
             'expected_utility': utility,
@@ -131,9 +157,12 @@ def optimize():
             'status': 'submitted'
         })
         
+    except ValueError as e:
+        log.warning("Rejected optimization request: %s", e)
+        return orjson_response({'error': str(e)}, 400)
     except Exception as e:
-        print(f"Error in optimize: {e}")
-        return jsonify({'error': str(e)}), 500
+        log.exception("Error in optimize: %s", e)
+        return orjson_response({'error': str(e)}, 500)
 
 
 @app.route('/receive_matrices', methods=['POST'])
@@ -160,86 +189,113 @@ def receive_matrices():
         data = request.get_json()
         
         if not data:
-            return jsonify({'error': 'No data provided'}), 400
+            return orjson_response({'error': 'No data provided'}, 400)
         
         time_vector = data.get('time_vector')
         expense_vector = data.get('expense_vector')
-        step = data.get('step', state['step'])
+        step = data.get('step', state.step)
         
         if not time_vector or not expense_vector:
-            return jsonify({'error': 'Missing time_vector or expense_vector'}), 400
+            return orjson_response({'error': 'Missing time_vector or expense_vector'}, 400)
+        
+        log.info("=== Received Matrices for %s (Step %s) ===", USER_ID, step)
+        
+        # Convert once; the optimizer and the reductions below share the arrays
+        time_vector = np.asarray(time_vector, dtype=np.float64)
+        expense_vector = np.asarray(expense_vector, dtype=np.float64)
+        
+        # Reduce once here; /get_results serves these cached scalars
+        max_time = float(time_vector.max())
+        total_expense = float(expense_vector.sum())
         
-        print(f"\n=== Received Matrices for {USER_ID} (Step {step}) ===")
+        # Calculate actual utility for the published allocation outside the
+        # lock, then store it
+        with state_lock:
+            allocation_vector = state.allocation_vector
+            expected_utility = state.expected_utility
         
-        # Calculate actual utility
         actual_utility = optimizer.calculate_actual_utility_from_matrices(
-            time_vector, expense_vector
+            time_vector, expense_vector,
+            allocation_vector=allocation_vector,
+            expected_utility=expected_utility or 0
         )
         
-        # Store state
-        state['time_vector'] = time_vector
-        state['expense_vector'] = expense_vector
-        state['actual_utility'] = actual_utility
+        with state_lock:
+            state.time_vector = time_vector
+            state.expense_vector = expense_vector
+            state.max_time = max_time
+            state.total_expense = total_expense
+            state.actual_utility = actual_utility
         
-        utility_loss = state['expected_utility'] - actual_utility if state['expected_utility'] else 0
+        utility_loss = expected_utility - actual_utility if expected_utility else 0
         
-        return jsonify({
+        return orjson_response({
             'user_id': USER_ID,
             'actual_utility': actual_utility,
-            'expected_utility': state['expected_utility'],
+            'expected_utility': expected_utility,
             'utility_loss': utility_loss,
-            'max_time': max(time_vector),
-            'total_expense': sum(expense_vector),
+            'max_time': max_time,
+            'total_expense': total_expense,
             'step': step
         })
         
     except Exception as e:
-        print(f"Error in receive_matrices: {e}")
-        return jsonify({'error': str(e)}), 500
+        log.exception("Error in receive_matrices: %s", e)
+        return orjson_response({'error': str(e)}, 500)
 
 
 @app.route('/get_allocation', methods=['GET'])
 def get_allocation():
     """Get current allocation and state"""
-    return jsonify({
-        'user_id': USER_ID,
-        'allocation_vector': state['allocation_vector'],
-        'expected_utility': state['expected_utility'],
-        'actual_utility': state['actual_utility'],
-        'step': state['step']
-    })
+    with state_lock:
+        body = {
+            'user_id': USER_ID,
+            'allocation_vector': state.allocation_vector,
+            'expected_utility': state.expected_utility,
+            'actual_utility': state.actual_utility,
+            'step': state.step
+        }
+    return orjson_response(body)
 
 
 @app.route('/get_results', methods=['GET'])
 def get_results():
     """Get complete results for reporting"""
-    return jsonify({
-        'user_id': USER_ID,
-        'allocation_vector': state['allocation_vector'],
-        'expected_utility': state['expected_utility'],
-        'actual_utility': state['actual_utility'],
-        'utility_loss': (state['expected_utility'] - state['actual_utility']) 
-                       if state['expected_utility'] and state['actual_utility'] else None,
-        'max_time': max(state['time_vector']) if state['time_vector'] else None,
-        'total_expense': sum(state['expense_vector']) if state['expense_vector'] else None,
-        'step': state['step'],
-        'constraints': {
-            'deadline': optimizer.deadline,
-            'budget': optimizer.budget
-        },
-        'weights': {
-            'time': optimizer.weight_time,
-            'expense': optimizer.weight_expense
+    with state_lock:
+        body = {
+            'user_id': USER_ID,
+            'allocation_vector': state.allocation_vector,
+            'expected_utility': state.expected_utility,
+            'actual_utility': state.actual_utility,
+            'utility_loss': (state.expected_utility - state.actual_utility)
+                           if state.expected_utility and state.actual_utility else None,
+            'max_time': state.max_time,
+            'total_expense': state.total_expense,
+            'step': state.step,
+            'constraints': {
+                'deadline': optimizer.deadline,
+                'budget': optimizer.budget
+            },
+            'weights': {
+                'time': optimizer.weight_time,
+                'expense': optimizer.weight_expense
+            }
         }
-    })
+    return orjson_response(body)
 
 
+# Production: serve with gunicorn using threaded workers, e.g.
+#   USER_ID=S1 gunicorn -w 1 -k gthread --threads 8 --timeout 30 -b 0.0.0.0:5000 user.user_app:app
+# Keep a single worker process: `state` lives in process memory, so the
+# allocation stored by /optimize must be visible to /receive_matrices.
+# Running this module directly starts the Werkzeug development server.
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
+    debug = os.environ.get('FLASK_DEBUG') == '1'
     print(f"\n{'='*60}")
-    print(f"Starting User Flask App: {USER_ID}")
+    print(f"Starting User Flask App: {USER_ID} (development server)")
     print(f"Port: {port}")
     print(f"{'='*60}\n")
     
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=debug, threaded=True)
 
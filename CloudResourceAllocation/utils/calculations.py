@@ -4,39 +4,88 @@ Includes allocation generation, utility calculations, and matrix operations
 """
 
 import numpy as np
-from itertools import combinations
-from typing import List, Tuple, Dict
+from functools import lru_cache
+from math import comb
+from typing import List, Optional, Tuple
 
 
-def generate_valid_allocations(num_subtasks: int, num_resources: int) -> List[List[int]]:
+@lru_cache(maxsize=None)
+def generate_allocation_masks(num_subtasks: int, num_resources: int) -> np.ndarray:
     """
-    Generate all valid allocation vectors for a task.
+    Generate all valid allocations as bitmasks.
     
-    Constraints:
-    - Each subtask must be assigned to exactly one resource (sum of row = 1)
-    - Each resource can have at most one subtask (sum of column ≤ 1)
+    Each allocation vector is stored as one integer: the vector read as
+    a binary number, so resource j is bit (num_resources - 1 - j). The
+    masks with exactly num_subtasks bits set are enumerated with Gosper's
+    hack (next integer with the same number of set bits) and stored in
+    descending order, which is the lexicographic order of
+    itertools.combinations.
+    
+    The result only depends on the arguments, so it is cached and
+    returned read-only; copy it before modifying.
     
     Args:
         num_subtasks: Number of subtasks (k)
-        num_resources: Number of available resources (m)
+        num_resources: Number of available resources (m, at most 64)
     
     Returns:
-        List of allocation vectors (each is a list of length m)
+        uint64 array of C(m, k) allocation masks
     """
     if num_subtasks > num_resources:
         raise ValueError("Cannot allocate more subtasks than resources")
+    if num_resources > 64:
+        raise ValueError("Cannot enumerate allocations over more than 64 resources")
+    
+    masks = np.empty(comb(num_resources, num_subtasks), dtype='<u8')
+    
+    if num_subtasks == 0:
+        masks[0] = 0
+    else:
+        # Ascending masks with exactly num_subtasks bits set, stored from
+        # the end so they come out descending
+        limit = 1 << num_resources
+        v = (1 << num_subtasks) - 1
+        i = masks.size
+        while v < limit:
+            i -= 1
+            masks[i] = v
+            c = v & -v
+            r = v + c
+            v = (((r ^ v) >> 2) // c) | r
+    
+    masks.setflags(write=False)
+    return masks
+
+
+@lru_cache(maxsize=None)
+def generate_valid_allocations(num_subtasks: int, num_resources: int) -> np.ndarray:
+    """
+    Generate all valid allocation vectors for a task.
+    
+    Constraints:
+    - Each subtask must be assigned to exactly one resource (sum of row = 1)
+    - Each resource can have at most one subtask (sum of column ≤ 1)
+    
+    The masks of generate_allocation_masks unpacked into rows in one
+    pass, in the lexicographic order of itertools.combinations.
     
-    valid_allocations = []
+    The result only depends on the arguments, so it is cached and
+    returned read-only; copy it before modifying.
     
-    # Choose which num_subtasks resources to use from num_resources available
-    for resource_combination in combinations(range(num_resources), num_subtasks):
-        # For each combination, create allocation vector
-        allocation = [0] * num_resources
-        for resource_idx in resource_combination:
-            allocation[resource_idx] = 1
-        valid_allocations.append(allocation)
+    Args:
+        num_subtasks: Number of subtasks (k)
+        num_resources: Number of available resources (m, at most 64)
     
-    return valid_allocations
+    Returns:
+        uint8 array of allocation vectors (C(m, k) x m)
+    """
+    masks = generate_allocation_masks(num_subtasks, num_resources)
+    
+    # Bits in little-endian order: column b holds bit b of each mask
+    bits = np.unpackbits(masks.view(np.uint8), bitorder='little').reshape(-1, 64)
+    allocations = np.ascontiguousarray(bits[:, :num_resources][:, ::-1])
+    allocations.setflags(write=False)
+    return allocations
 
 
 def calculate_execution_time_vector(allocation_vector: List[int], 
@@ -125,6 +174,9 @@ def check_constraints(allocation_vector: List[int],
     """
     Check if allocation satisfies deadline and budget constraints.
     
+    Scalar loop for a single list vector; for arrays of allocations,
+    compare the results of batch_time_and_expense instead.
+    
     Args:
         allocation_vector: Allocation vector
         execution_times: Base execution time for each resource
@@ -144,78 +196,114 @@ def check_constraints(allocation_vector: List[int],
     return max_time <= deadline and total_expense <= budget
 
 
-def calculate_actual_execution_matrix(allocation_matrix: List[List[int]],
-                                     base_execution_times: List[List[float]]) -> List[List[float]]:
+def batch_time_and_expense(allocations: np.ndarray,
+                           execution_times: np.ndarray,
+                           resource_prices: np.ndarray,
+                           cost_rates: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Calculate actual execution time matrix accounting for multiplexing.
+    Calculate the max time and total expense of many allocations at once.
     
-    When multiple users share a resource, execution time increases proportionally.
-    Formula: tij = (Σ_i aij) * t̂ij
+    Vectorized over the rows of an allocation array, e.g. the output of
+    generate_valid_allocations, with the same values as the per-vector
+    functions: the expense is accumulated column by column, in the same
+    order as calculate_utility (A @ cost_rates may round differently).
     
     Args:
-        allocation_matrix: Matrix of allocation vectors (n x m)
-        base_execution_times: Base execution time matrix (n x m)
+        allocations: Allocation vectors (N x m, 0/1 entries)
+        execution_times: Base execution time for each resource
+        resource_prices: Price for each resource
+        cost_rates: Optional precomputed t̂j * pj for these execution
+                    times (e.g. a row of the config's TP_MATRIX), saves the product
+    
+    Returns:
+        Tuple of (max_time, total_expense) float64 arrays of N values
+    """
+    execution_times = np.asarray(execution_times, dtype=np.float64)
+    if cost_rates is None:
+        cost_rates = execution_times * np.asarray(resource_prices, dtype=np.float64)
+    
+    n_rows, n_resources = allocations.shape
+    max_time = (allocations * execution_times).max(axis=1)
+    
+    total_expense = np.zeros(n_rows)
+    for j in range(n_resources):
+        total_expense += allocations[:, j] * cost_rates[j]
+    
+    return max_time, total_expense
+
+
+def best_by_denominator(denominators: np.ndarray,
+                        feasible: np.ndarray) -> Tuple[int, float]:
+    """
+    Pick the best feasible allocation from utility denominators.
+    
+    Same result as argmax over the utilities 1 / d of the feasible rows
+    with d > 0 (first maximum wins), with a single division: the argmin
+    of d. Distinct denominators can round to the same utility, so rows
+    before the argmin that are within a few ulps are checked for an
+    equal utility.
+    
+    Args:
+        denominators: Utility denominators wt * max_time + we * total_expense
+        feasible: Boolean mask of the rows that meet the constraints
     
     Returns:
-        Actual execution time matrix (n x m)
+        Tuple of (row index, utility), or (-1, 0.0) when no row qualifies
     """
-    n_tasks = len(allocation_matrix)
-    m_resources = len(allocation_matrix[0])
-    
-    actual_times = []
-    
-    for i in range(n_tasks):
-        task_times = []
-        for j in range(m_resources):
-            # Count how many tasks assigned subtasks to resource j
-            multiplexing_factor = sum(allocation_matrix[k][j] for k in range(n_tasks))
-            
-            # Calculate actual time for this task on this resource
-            if allocation_matrix[i][j] == 1:
-                actual_time = multiplexing_factor * base_execution_times[i][j]
-            else:
-                actual_time = 0
-            
-            task_times.append(actual_time)
-        actual_times.append(task_times)
-    
-    return actual_times
-
-
-def calculate_actual_expense_matrix(allocation_matrix: List[List[int]],
-                                   base_execution_times: List[List[float]],
-                                   resource_prices: List[float]) -> List[List[float]]:
+    masked = np.where(feasible & (denominators > 0), denominators, np.inf)
+    best_idx = int(np.argmin(masked))
+    best_denominator = masked[best_idx]
+    if not np.isfinite(best_denominator):
+        return -1, 0.0
+    
+    best_utility = 1.0 / best_denominator
+    for i in np.flatnonzero(masked[:best_idx] <= best_denominator * (1 + 4 * np.finfo(np.float64).eps)):
+        if 1.0 / masked[i] == best_utility:
+            best_idx = int(i)
+            break
+    return best_idx, float(best_utility)
+
+
+def calculate_actual_matrices(allocation_matrix: List[List[int]],
+                              base_execution_times: List[List[float]],
+                              resource_prices: List[float],
+                              price_weighted_times: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Calculate actual expense matrix.
+    Calculate the actual execution time and expense matrices together.
     
-    Formula: eij = aij * t̂ij * pj
+    When multiple users share a resource, execution time increases proportionally.
+    Formulas: tij = (Σ_i aij) * t̂ij and eij = aij * t̂ij * pj
+    
+    Both matrices are computed in one call from the same allocation
+    array; the multiplexing factors are the column sums, computed once
+    for all tasks.
     
     Args:
         allocation_matrix: Matrix of allocation vectors (n x m)
         base_execution_times: Base execution time matrix (n x m)
         resource_prices: Price vector for resources
+        price_weighted_times: Optional precomputed t̂ij * pj (n x m, e.g.
+                              the config's TP_MATRIX), saves the product
     
     Returns:
-        Expense matrix (n x m)
+        Tuple of (time_matrix, expense_matrix) as float64 arrays (n x m)
     """
-    n_tasks = len(allocation_matrix)
-    m_resources = len(allocation_matrix[0])
+    allocation_matrix = np.asarray(allocation_matrix)
+    base_execution_times = np.asarray(base_execution_times, dtype=np.float64)
     
-    expense_matrix = []
+    multiplexing_factors = allocation_matrix.sum(axis=0)
+    time_matrix = allocation_matrix * multiplexing_factors * base_execution_times
     
-    for i in range(n_tasks):
-        task_expenses = []
-        for j in range(m_resources):
-            expense = allocation_matrix[i][j] * base_execution_times[i][j] * resource_prices[j]
-            task_expenses.append(expense)
-        expense_matrix.append(task_expenses)
+    if price_weighted_times is None:
+        price_weighted_times = base_execution_times * np.asarray(resource_prices, dtype=np.float64)
+    expense_matrix = allocation_matrix * price_weighted_times
     
-    return expense_matrix
+    return time_matrix, expense_matrix
 
 
-def calculate_actual_utility(allocation_vector: List[int],
-                            actual_time_vector: List[float],
-                            actual_expense_vector: List[float],
+def calculate_actual_utility(allocation_vector: np.ndarray,
+                            actual_time_vector: np.ndarray,
+                            actual_expense_vector: np.ndarray,
                             weight_time: float,
                             weight_expense: float) -> float:
     """
@@ -223,16 +311,26 @@ def calculate_actual_utility(allocation_vector: List[int],
     
     Args:
         allocation_vector: Allocation vector
-        actual_time_vector: Actual execution times (with multiplexing)
-        actual_expense_vector: Actual expenses
+        actual_time_vector: Actual execution times (with multiplexing),
+                            ndarray or list
+        actual_expense_vector: Actual expenses, ndarray or list
         weight_time: Weight for time
         weight_expense: Weight for expense
     
     Returns:
         Actual utility value
     """
-    max_time = max(actual_time_vector) if max(actual_time_vector) > 0 else 0
-    total_expense = sum(actual_expense_vector)
+    # ndarray reductions for arrays; lists keep the builtins, which are
+    # faster than converting a handful of values to an array
+    if isinstance(actual_time_vector, np.ndarray):
+        max_time = float(actual_time_vector.max())
+    else:
+        max_time = max(actual_time_vector)
+    
+    if isinstance(actual_expense_vector, np.ndarray):
+        total_expense = float(actual_expense_vector.sum())
+    else:
+        total_expense = sum(actual_expense_vector)
     
     denominator = weight_time * max_time + weight_expense * total_expense
     
@@ -243,7 +341,7 @@ def calculate_actual_utility(allocation_vector: List[int],
 
 
 def update_execution_times_step2(actual_times_step1: List[List[float]],
-                                 base_execution_times: List[List[float]]) -> List[List[float]]:
+                                 base_execution_times: List[List[float]]) -> np.ndarray:
     """
     Update execution times for Step 2 using the formula:
     t_new_ij = t̂_ij + Σ(tij)/n
@@ -253,26 +351,21 @@ def update_execution_times_step2(actual_times_step1: List[List[float]],
         base_execution_times: Base execution time matrix
     
     Returns:
-        Updated execution time matrix for Step 2
+        Updated execution time matrix for Step 2 (float64 array, n x m)
     """
-    n_tasks = len(actual_times_step1)
-    m_resources = len(actual_times_step1[0])
-    
-    updated_times = []
-    
-    for i in range(n_tasks):
-        task_times = []
-        for j in range(m_resources):
-            # Calculate average of actual times for this resource across all tasks
-            sum_times = sum(actual_times_step1[k][j] for k in range(n_tasks))
-            avg_time = sum_times / n_tasks
-            
-            # Update formula
-            new_time = base_execution_times[i][j] + avg_time
-            task_times.append(new_time)
-        updated_times.append(task_times)
-    
-    return updated_times
+    actual_times_step1 = np.asarray(actual_times_step1, dtype=np.float64)
+    n_tasks, m_resources = actual_times_step1.shape
+    
+    # The average actual time of each resource is the same for every
+    # task, so it is computed once and broadcast over the rows. Rows are
+    # added one at a time: mean(axis=0) sums pairwise for larger n, which
+    # can round differently and shift the Step 2 times
+    sum_times = np.zeros(m_resources)
+    for task_times in actual_times_step1:
+        sum_times += task_times
+    avg_times = sum_times / n_tasks
+    
+    return np.asarray(base_execution_times, dtype=np.float64) + avg_times
 
 
 def format_allocation_vector(allocation_vector: List[int]) -> str:
@@ -280,12 +373,30 @@ def format_allocation_vector(allocation_vector: List[int]) -> str:
     return f"({', '.join(map(str, allocation_vector))})"
 
 
-def print_matrix(matrix: List[List[float]], name: str, precision: int = 2):
-    """Pretty print a matrix"""
-    print(f"\n{name}:")
+def format_allocations(allocations: np.ndarray) -> str:
+    """
+    Format many allocation vectors as one string for display
+    
+    Formats the whole array with np.array2string instead of one Python
+    join per row; build it only when the output is actually emitted
+    (e.g. behind logger.isEnabledFor).
+    """
+    return np.array2string(np.asarray(allocations), separator=', ',
+                           threshold=np.iinfo(np.intp).max)
+
+
+def format_matrix(matrix: List[List[float]], name: str, precision: int = 2) -> str:
+    """Format a matrix as a multi-line string for display"""
+    lines = [f"\n{name}:"]
     for i, row in enumerate(matrix):
         formatted_row = [f"{val:.{precision}f}" for val in row]
-        print(f"  Task {i+1}: [{', '.join(formatted_row)}]")
+        lines.append(f"  Task {i+1}: [{', '.join(formatted_row)}]")
+    return "\n".join(lines)
+
+
+def print_matrix(matrix: List[List[float]], name: str, precision: int = 2):
+    """Pretty print a matrix"""
+    print(format_matrix(matrix, name, precision))
 
 
 if __name__ == '__main__':
@@ -294,6 +405,5 @@ if __name__ == '__main__':
     allocations = generate_valid_allocations(num_subtasks=2, num_resources=5)
     print(f"Generated {len(allocations)} valid allocations for 2 subtasks on 5 resources")
     print("First 5 allocations:")
-    for alloc in allocations[:5]:
-        print(f"  {format_allocation_vector(alloc)}")
+    print(format_allocations(allocations[:5]))
 
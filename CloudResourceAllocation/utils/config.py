@@ -3,6 +3,8 @@ Configuration file for cloud resource allocation game
 Contains constants for resources, tasks, and constraints
 """
 
+import numpy as np
+
 # Student ID placeholder (last 2 digits)
 STUDENT_ID_LAST_TWO = 88  # Updated with student ID
 
@@ -20,6 +22,20 @@ EXECUTION_TIME_MATRIX = [
     [4.0, 3.5, 3.2, 2.8, 2.4]     # S3
 ]
 
+# NumPy copies of the tables above, built once and read-only, so the
+# vectorized code shares them instead of converting the lists per call.
+# float64 on purpose: float32 rounds the times and prices enough to
+# flip deadline/budget checks that sit exactly on the boundary.
+RESOURCE_PRICES_ARRAY = np.array(RESOURCE_PRICES, dtype=np.float64)
+RESOURCE_PRICES_ARRAY.setflags(write=False)
+EXECUTION_TIME_ARRAY = np.array(EXECUTION_TIME_MATRIX, dtype=np.float64)
+EXECUTION_TIME_ARRAY.setflags(write=False)
+
+# Price-weighted base times t̂ij * pj: the expense of every allocated
+# subtask, so scoring an allocation needs no multiplications by price
+TP_MATRIX = EXECUTION_TIME_ARRAY * RESOURCE_PRICES_ARRAY
+TP_MATRIX.setflags(write=False)
+
 # Number of subtasks for each task
 NUM_SUBTASKS = {
     'S1': 2,
@@ -76,6 +92,10 @@ def get_execution_times(user_id):
     idx = get_user_index(user_id)
     return EXECUTION_TIME_MATRIX[idx]
 
+def get_execution_times_array(user_id):
+    """Get execution time vector for a specific user as a read-only array view"""
+    return EXECUTION_TIME_ARRAY[get_user_index(user_id)]
+
 def print_config():
     """Print configuration for verification"""
     print("=== Cloud Resource Allocation Configuration ===")
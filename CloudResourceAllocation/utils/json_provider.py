@@ -0,0 +1,45 @@
+"""
+orjson-backed JSON provider for the Flask applications
+Replaces the stdlib json encoder used by jsonify and request.get_json
+"""
+
+import orjson
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that serializes with orjson
+
+    NumPy arrays and scalars are serialized natively, so handlers can
+    return them without converting to lists first.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        """Serialize obj to a JSON string"""
+        return orjson.dumps(obj, option=ORJSON_OPTIONS).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        """Deserialize a JSON string or bytes"""
+        return orjson.loads(s)
+
+
+def orjson_response(body, status: int = 200) -> Response:
+    """
+    Build a JSON response straight from orjson bytes
+    
+    Skips the str round-trip jsonify makes through the JSON provider.
+    
+    Args:
+        body: JSON-serializable object (NumPy values allowed)
+        status: HTTP status code
+    
+    Returns:
+        Flask Response with mimetype application/json
+    """
+    return Response(orjson.dumps(body, option=ORJSON_OPTIONS),
+                    status=status, mimetype='application/json')